@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, PlainTextResponse
+from datetime import datetime, timezone
+from typing import Literal
+import os
+
+from ..core.config import settings
+from ..core.deps import CurrentUser, get_admin_user
+from ..core.profiling import create_profile_token, profile_path, profile_report
+from ..core.slow_queries import slow_query_log
+from ..schemas.admin import ProfileToken, SlowQueryReport
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/slow-queries", response_model=SlowQueryReport)
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    order_by: Literal["total", "p95"] = Query("total", description="Rank by total or p95 time"),
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    """Slowest statement fingerprints since startup, with their query plans"""
+    return SlowQueryReport(
+        threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+        order_by=order_by,
+        queries=slow_query_log.top(limit, order_by)
+    )
+
+
+@router.post("/profile-token", response_model=ProfileToken)
+async def create_profile_request_token(admin: CurrentUser = Depends(get_admin_user)):
+    """
+    Token for profiling requests
+    Any request sent with it before it expires is run under cProfile;
+    its X-Profile-Id response header names the stored profile
+    """
+    token, expires_at = create_profile_token()
+    return ProfileToken(token=token, expires_at=datetime.fromtimestamp(expires_at, timezone.utc))
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: Literal["text", "pstats"] = Query("text", description="Printed report or the raw pstats file"),
+    limit: int = Query(50, ge=1, le=1000, description="Functions listed in the text report"),
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    """A stored request profile, sorted by cumulative time"""
+    path = profile_path(profile_id)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+
+    if format == "pstats":
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+    return PlainTextResponse(profile_report(path, limit))
@@ -1,8 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..core.database import get_db
-from ..core.security import hash_password, verify_password, create_access_token
-from ..core.deps import get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.database import get_async_db
+from ..core.security import (
+    hash_password_async,
+    verify_password_async,
+    create_access_token,
+    PasswordHasherBusy
+)
+from ..core.deps import CurrentUser, get_current_user
+from ..core.query_budget import query_budget
 from ..models.user import User
 from ..schemas.auth import UserRegistration, UserLogin, UserResponse, Token
 
@@ -11,13 +18,22 @@ from ..schemas.auth import UserRegistration, UserLogin, UserResponse, Token
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 
+def password_pool_busy() -> HTTPException:
+    """Response for when the password hashing pool is saturated"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, please retry",
+        headers={"Retry-After": "1"}
+    )
+
+
 @router.post("/register",
              response_model=UserResponse,
              status_code=status.HTTP_201_CREATED
              )
-def register_user(
+async def register_user(
     user_data: UserRegistration,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Register a new user account
@@ -28,15 +44,19 @@ def register_user(
     5. Returns user info
     """
     # Check if user exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    result = await db.execute(select(User).filter(User.email == user_data.email))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registers"
         )
     
-    # hash password
-    hashed_password = hash_password(user_data.password)
+    # hash password on the dedicated pool
+    try:
+        hashed_password = await hash_password_async(user_data.password)
+    except PasswordHasherBusy:
+        raise password_pool_busy()
 
     # create new user
     new_user = User(
@@ -48,25 +68,31 @@ def register_user(
 
     # Save to DB
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return new_user
 
 @router.post("/login", response_model=Token)
-def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
+@query_budget(1)
+async def login_user(login_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """
         Login Existing User
     """
     # Validate Username
-    user = db.query(User).filter(User.email == login_data.email).first()
+    result = await db.execute(select(User).filter(User.email == login_data.email))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
-    # Verify password
-    if not verify_password(login_data.password, user.hashed_password):
+    # Verify password on the dedicated pool
+    try:
+        password_valid = await verify_password_async(login_data.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise password_pool_busy()
+    if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -77,7 +103,7 @@ def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
     return Token(access_token=access_token)
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: CurrentUser = Depends(get_current_user)):
     """
     Get current user information
     """
@@ -1,146 +1,566 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+import json
+import os
+import uuid
 
-from ..core.database import get_db
-from ..models.user import User
-from ..core.deps import get_current_user
-from ..models.health_record import HealthRecord
+from ..core.cache import load_cache_backend
+from ..core.config import settings
+from ..core.database import get_async_db, get_async_session_factory, get_session_factory
+from ..core.query_budget import query_budget
+from ..core.deps import (
+    CurrentUser,
+    check_daily_data_etag,
+    check_data_etag,
+    get_current_data_version,
+    get_current_user
+)
+from ..models.health_rollup import HealthRecordRollup
+from ..models.health_aggregate import HealthRecordAggregate
+from ..models.import_job import ImportJob
 from ..schemas.health import (
     HealthRecordCreate, 
     HealthRecordResponse,
     QuickAdd,
     MeasurementType,
     HealthSummary,
-    HealthRecordsQuery
+    HealthRecordsQuery,
+    HealthSeries,
+    SeriesBucketSize,
+    SeriesPoint,
+    HealthAnalytics,
+    FileFormat
+)
+from ..schemas.health_data import BulkHealthRecordResult, ImportJobResponse
+from ..services.health_service import (
+    filter_records,
+    list_records,
+    naive_utc,
+    records_cache_key,
+    encode_cursor,
+    decode_cursor,
+    parse_bulk_payload,
+    validate_bulk_items,
+    bulk_insert_rows,
+    insert_records_returning,
+    bucket_expression,
+    parse_bucket_start,
+    export_csv_header,
+    export_csv_chunk,
+    export_ndjson_chunk,
+    serialize_record_rows,
+    EXPORT_COLUMNS,
+    BULK_MAX_RECORDS
 )
+from ..services.rollup_service import update_rollups
+from ..services import analytics_service
+from ..services.import_service import claim_import, run_import
+from ..services.partition_service import record_tables
+from ..services.version_service import bump_data_version
 
 router = APIRouter(prefix="/health", tags=["health"])
 
+# Rows fetched from the cursor and serialized per streamed chunk
+EXPORT_CHUNK_SIZE = 1000
+
+# Serialized record pages and summaries; keys carry the user's data
+# version, so writes make old entries unreachable rather than stale
+response_cache = load_cache_backend(
+    settings.RESPONSE_CACHE_BACKEND,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    maxsize=settings.RESPONSE_CACHE_MAXSIZE
+)
+
 @router.post("/records", response_model=HealthRecordResponse, status_code=status.HTTP_201_CREATED)
-def create_health_record(
+@query_budget(4)
+async def create_health_record(
     record_data: HealthRecordCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Add a new health measurement"""
     
-    # Create health record from schema data
-    health_record = HealthRecord(
-        user_id=current_user.id,
-        measurement_type=record_data.measurement_type.value,
-        value=record_data.value,
-        unit=record_data.unit,
-        notes=record_data.notes,
-        measured_at=record_data.measured_at
-    )
+    # Build health record row from schema data
+    row = {
+        "user_id": current_user.id,
+        "measurement_type": record_data.measurement_type.value,
+        "value": record_data.value,
+        "unit": record_data.unit,
+        "notes": record_data.notes,
+        "measured_at": record_data.measured_at
+    }
 
-    # Save to DB
-    db.add(health_record)
-    db.commit()
-    db.refresh(health_record)
+    # Save to DB, rollups and data version in the same transaction
+    health_record = (await db.run_sync(insert_records_returning, [row]))[0]
+    await db.run_sync(update_rollups, current_user.id, [health_record])
+    await db.run_sync(bump_data_version, current_user.id)
+    await db.commit()
 
     return health_record
 
 @router.post("/quick-add", response_model=List[HealthRecordResponse], status_code=status.HTTP_201_CREATED)
-def quick_add_health_records(
+@query_budget(4)
+async def quick_add_health_records(
     quick_data: QuickAdd,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Add multiple health measurements at once"""
 
-    # Convert QuickAdd to HealthRecord object
+    # Convert QuickAdd to HealthRecord schemas
     health_record_schema = quick_data.to_health_records()
 
-    # Create database objecst
-    created_records = []
-    for record_schema in health_record_schema:
-        health_record = HealthRecord(
-            user_id=current_user.id,
-            measurement_type=record_schema.measurement_type.value,
-            value=record_schema.value,
-            unit=record_schema.unit,
-            notes=record_schema.notes,
-            measured_at=record_schema.measured_at
+    # Build database rows
+    rows = [
+        {
+            "user_id": current_user.id,
+            "measurement_type": record_schema.measurement_type.value,
+            "value": record_schema.value,
+            "unit": record_schema.unit,
+            "notes": record_schema.notes,
+            "measured_at": record_schema.measured_at
+        }
+        for record_schema in health_record_schema
+    ]
+
+    # Save to DB in one statement, rollups and data version in the same transaction
+    created_records = await db.run_sync(insert_records_returning, rows)
+    await db.run_sync(update_rollups, current_user.id, created_records)
+    await db.run_sync(bump_data_version, current_user.id)
+    await db.commit()
+
+    return created_records
+
+@router.post("/records/bulk", response_model=BulkHealthRecordResult)
+@query_budget(allow_repeats=True)  # The same statements run per chunk
+async def bulk_add_health_records(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Add a large batch of health measurements (device sync)
+    Accepts a JSON array, {"records": [...]}, or NDJSON when sent with
+    Content-Type application/x-ndjson. Valid items are inserted in
+    chunks; invalid items are skipped and reported by index.
+    """
+    body = await request.body()
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+
+    try:
+        items, errors = parse_bulk_payload(body, ndjson)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid bulk payload"
         )
-        created_records.append(health_record)
 
-    # Save to DB
-    for record in created_records:
-        db.add(record)
+    if len(items) > BULK_MAX_RECORDS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Bulk uploads are limited to {BULK_MAX_RECORDS} records"
+        )
 
-    db.commit()
+    # Validation is CPU-bound, keep it off the event loop
+    rows, item_errors = await run_in_threadpool(validate_bulk_items, current_user.id, items)
+    errors = sorted(errors + item_errors, key=lambda error: error.index)
 
-    for record in created_records:
-        db.refresh(record)
+    inserted = await db.run_sync(bulk_insert_rows, current_user.id, rows)
 
-    return created_records
+    return BulkHealthRecordResult(
+        received=len(items),
+        inserted=inserted,
+        failed=len(errors),
+        errors=errors
+    )
 
 @router.get("/records", response_model=List[HealthRecordResponse])
-def get_health_records(
-    measurement_types: Optional[List[MeasurementType]] = None,
+@query_budget(5)
+async def get_health_records(
+    measurement_types: Optional[List[MeasurementType]] = Query(None),
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    limit: int = 50,
-    offset: int = 0,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    etag: str = Depends(check_data_etag),
+    version: int = Depends(get_current_data_version)
 ):
-    """Get user's health records with filtering"""
+    """
+    Get user's health records with filtering
+    Records are returned newest first. Pass the X-Next-Cursor header
+    from a page back as `cursor` to fetch the next page (keyset
+    pagination); `offset` is still accepted for simple clients.
+    """
 
-    # Start with base query for current user
-    query = db.query(HealthRecord).filter(HealthRecord.user_id == current_user.id)
+    cache_key = records_cache_key(
+        current_user.id, version, measurement_types, start_date, end_date, limit, offset, cursor
+    )
+    cached = response_cache.get(cache_key) if response_cache is not None else None
+    if cached is not None:
+        body, next_cursor = cached
+        return records_response(body, etag, next_cursor)
 
-    if measurement_types:
-        type_values = [mt.value for mt in measurement_types]
-        query = query.filter(HealthRecord.measurement_type.in_(type_values))
-    
-    if start_date:
-        query = query.filter(HealthRecord.measured_at >= start_date)
-    
-    if end_date:
-        query = query.filter(HealthRecord.measured_at <= end_date)
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+
+    # Plain column tuples that serialize_record_rows encodes directly
+    rows = await db.run_sync(
+        list_records, current_user.id, measurement_types, start_date, end_date,
+        limit, offset, position
+    )
 
-    records = query.offset(offset).limit(limit).all()
+    # A full page may have more behind it
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.measured_at, last.id)
 
-    return records
+    body = serialize_record_rows(rows)
+    if response_cache is not None:
+        response_cache.set(cache_key, (body, next_cursor), len(body))
+
+    return records_response(body, etag, next_cursor)
+
+def records_response(body: bytes, etag: str, next_cursor: Optional[str]) -> Response:
+    """
+    Response for a serialized page of records
+    Returning the body directly bypasses response_model validation,
+    which is kept for the OpenAPI schema
+    """
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/export")
+@query_budget(4)
+async def export_health_records(
+    export_format: FileFormat = Query(FileFormat.CSV, alias="format"),
+    measurement_types: Optional[List[MeasurementType]] = Query(None),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    session_factory = Depends(get_async_session_factory),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Download the user's health records as CSV or NDJSON
+    Accepts the same filters as GET /records. Rows are read through a
+    server-side cursor and written out chunk by chunk, so memory stays
+    flat regardless of export size.
+    """
+    if export_format == FileFormat.CSV:
+        serialize, media_type = export_csv_chunk, "text/csv"
+    else:
+        serialize, media_type = export_ndjson_chunk, "application/x-ndjson"
+
+    async def generate():
+        if export_format == FileFormat.CSV:
+            yield export_csv_header()
+        # Own session: the request's session may close before streaming ends
+        async with session_factory() as session:
+            # Partitions oldest first keep the export in time order
+            tables = await session.run_sync(record_tables, start_date, end_date)
+            for table in tables:
+                query = filter_records(
+                    select(*[table.c[column] for column in EXPORT_COLUMNS]),
+                    current_user.id, measurement_types, start_date, end_date, table
+                ).order_by(table.c.measured_at, table.c.id)
+                result = await session.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+                async for rows in result.partitions():
+                    yield serialize(rows)
+
+    filename = f"healthsync-export.{export_format.value}"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/summary", response_model=HealthSummary)
-def get_health_summary(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+@query_budget(6)
+async def get_health_summary(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    etag: str = Depends(check_data_etag),
+    version: int = Depends(get_current_data_version)
 ): 
     """Get health data summary for dashboard"""
 
-    # get all user's health records
-    all_records = db.query(HealthRecord).filter(
-        HealthRecord.user_id == current_user.id
-    ).all()
+    cache_key = f"summary:{current_user.id}:{version}"
+    body = response_cache.get(cache_key) if response_cache is not None else None
+    if body is not None:
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+    # One rollup row per measurement type, maintained on every write
+    result = await db.execute(select(HealthRecordRollup).filter(
+        HealthRecordRollup.user_id == current_user.id
+    ))
+    rollups = result.scalars().all()
 
     # Calculate summary statistics
-    total_records = len(all_records)
-    measurement_types_count = len(set(record.measurement_type for record in all_records))
+    total_records = sum(rollup.record_count for rollup in rollups)
+    measurement_types_count = len(rollups)
 
     # Calculate date range
     date_range = None
-    if all_records:
-        dates = [record.measured_at for record in all_records]
+    if rollups:
         date_range = {
-            "earliest": min(dates).isoformat(),
-            "latest": max(dates).isoformat()
+            "earliest": min(rollup.first_measured_at for rollup in rollups).isoformat(),
+            "latest": max(rollup.last_measured_at for rollup in rollups).isoformat()
         }
 
     # Get latest 5 measurements
-    latest_records = db.query(HealthRecord).filter(
-        HealthRecord.user_id == current_user.id
-    ).order_by(HealthRecord.measured_at.desc()).limit(5).all()
+    latest_records = await db.run_sync(list_records, current_user.id, limit=5)
 
-    return HealthSummary(
+    summary = HealthSummary(
         total_records=total_records,
         measurement_types_count=measurement_types_count,
         date_range=date_range,
         latest_measurement=latest_records
     )
 
+    # Rendered as the response_model path would, so the cached body matches
+    body = JSONResponse(jsonable_encoder(summary)).body
+    if response_cache is not None:
+        response_cache.set(cache_key, body, len(body))
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+@router.get("/series", response_model=HealthSeries)
+@query_budget(3)
+async def get_health_series(
+    measurement_type: MeasurementType,
+    bucket: SeriesBucketSize = SeriesBucketSize.DAY,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    etag: str = Depends(check_data_etag)
+):
+    """
+    Get chart data for one measurement type
+    Records are grouped into hour/day/week/month buckets and
+    aggregated in SQL, so only one row per bucket is returned
+    """
+    dialect_name = db.bind.dialect.name
+    tables = await db.run_sync(record_tables, start_date, end_date)
+
+    # One branch per partition; filters match the
+    # (user_id, measurement_type, measured_at) index of each
+    branches = [
+        filter_records(
+            select(
+                bucket_expression(dialect_name, bucket, table.c.measured_at).label("bucket_start"),
+                literal(1).label("samples"),
+                table.c.value.label("total"),
+                table.c.value.label("low"),
+                table.c.value.label("high")
+            ),
+            current_user.id, [measurement_type], start_date, end_date, table
+        )
+        for table in tables
+    ]
+
+    # Samples compacted by the retention job count with their statistics
+    aggregates = HealthRecordAggregate.__table__.c
+    compacted = select(
+        bucket_expression(dialect_name, bucket, aggregates.bucket_start).label("bucket_start"),
+        aggregates.sample_count,
+        aggregates.value_sum,
+        aggregates.value_min,
+        aggregates.value_max
+    ).where(
+        aggregates.user_id == current_user.id,
+        aggregates.measurement_type == measurement_type.value
+    )
+    # Aggregates are in range when their bucket starts in it
+    if start_date:
+        compacted = compacted.where(aggregates.bucket_start >= naive_utc(start_date))
+    if end_date:
+        compacted = compacted.where(aggregates.bucket_start <= naive_utc(end_date))
+    records = union_all(*branches, compacted).subquery()
+
+    query = select(
+        records.c.bucket_start,
+        func.sum(records.c.samples),
+        func.sum(records.c.total) / func.sum(records.c.samples),
+        func.min(records.c.low),
+        func.max(records.c.high)
+    ).group_by(records.c.bucket_start).order_by(records.c.bucket_start)
+
+    result = await db.execute(query)
+
+    points = [
+        SeriesPoint(
+            bucket_start=parse_bucket_start(start),
+            count=count,
+            avg=avg,
+            min=min_value,
+            max=max_value
+        )
+        for start, count, avg, min_value, max_value in result.all()
+    ]
+
+    return HealthSeries(
+        measurement_type=measurement_type,
+        bucket=bucket,
+        points=points
+    )
+
+@router.get("/analytics", response_model=HealthAnalytics)
+@query_budget(5)
+async def get_health_analytics(
+    measurement_type: MeasurementType,
+    window: int = Query(7, ge=1, le=1000, description="Samples in the rolling mean"),
+    alpha: float = Query(0.3, gt=0, le=1, description="EWMA smoothing factor"),
+    streak_min: Optional[float] = Query(None, description="Daily mean needed to extend a streak"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    etag: str = Depends(check_daily_data_etag)
+):
+    """Get trend, percentile and streak analytics for one measurement type"""
+
+    series = await db.run_sync(
+        analytics_service.load_series, current_user.id, measurement_type.value
+    )
+
+    # NumPy work is CPU-bound, keep it off the event loop
+    today = int(datetime.now(timezone.utc).timestamp() // analytics_service.SECONDS_PER_DAY)
+    stats = await run_in_threadpool(
+        analytics_service.summarize, series, window, alpha, today, streak_min
+    )
+
+    return HealthAnalytics(measurement_type=measurement_type, **stats)
+
+@router.post("/imports", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_import(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file_format: FileFormat = Query(..., alias="format"),
+    column_map: Optional[str] = Query(
+        None, description='JSON mapping of record fields to source columns, e.g. {"measured_at": "startDate"}'
+    ),
+    db: AsyncSession = Depends(get_async_db),
+    session_factory = Depends(get_session_factory),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Import a CSV or NDJSON export from another health app
+    The request body is the raw file. It is written to disk as it
+    arrives, then processed by a background job in bounded chunks;
+    poll GET /imports/{id} for progress.
+    """
+    if column_map is not None:
+        try:
+            mapping = json.loads(column_map)
+        except ValueError:
+            mapping = None
+        if not isinstance(mapping, dict):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="column_map must be a JSON object"
+            )
+
+    # Spool the upload to disk without holding it in memory; the file
+    # I/O runs in the threadpool
+    await run_in_threadpool(os.makedirs, settings.IMPORT_DIR, exist_ok=True)
+    file_path = os.path.join(settings.IMPORT_DIR, f"{uuid.uuid4().hex}.{file_format.value}")
+    bytes_total = 0
+    upload = await run_in_threadpool(open, file_path, "wb")
+    spooled = False
+    try:
+        async for chunk in request.stream():
+            bytes_total += len(chunk)
+            if bytes_total > settings.IMPORT_MAX_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Imports are limited to {settings.IMPORT_MAX_BYTES} bytes"
+                )
+            await run_in_threadpool(upload.write, chunk)
+        spooled = True
+    finally:
+        # Cleanup stays synchronous so a cancelled request still does it;
+        # a partial file (too large, client disconnected) is removed
+        upload.close()
+        if not spooled:
+            os.remove(file_path)
+
+    job = ImportJob(
+        user_id=current_user.id,
+        file_format=file_format.value,
+        file_path=file_path,
+        column_map=column_map,
+        bytes_total=bytes_total,
+        # Claimed by this request; the background task processes it
+        status="running"
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    background_tasks.add_task(run_import, session_factory, job.id)
+
+    return ImportJobResponse.from_job(job)
+
+async def get_user_import(db: AsyncSession, job_id: int, user_id: int) -> ImportJob:
+    """Load an import job owned by the user, or 404"""
+    result = await db.execute(select(ImportJob).filter(
+        ImportJob.id == job_id,
+        ImportJob.user_id == user_id
+    ))
+    job = result.scalars().first()
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import not found"
+        )
+    return job
+
+@router.get("/imports/{job_id}", response_model=ImportJobResponse)
+@query_budget(2)
+async def get_import(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Get the status and progress of an import"""
+    job = await get_user_import(db, job_id, current_user.id)
+    return ImportJobResponse.from_job(job)
+
+@router.post("/imports/{job_id}/resume", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def resume_import(
+    job_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    session_factory = Depends(get_session_factory),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Restart a failed or stalled import from its last committed chunk"""
+    job = await get_user_import(db, job_id, current_user.id)
+
+    # Claimed atomically, so concurrent resumes can't start two runners
+    if not await db.run_sync(claim_import, job.id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Import is {job.status} and cannot be resumed"
+        )
+    await db.refresh(job)
+
+    background_tasks.add_task(run_import, session_factory, job.id)
+
+    return ImportJobResponse.from_job(job)
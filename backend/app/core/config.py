@@ -1,5 +1,6 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -12,11 +13,93 @@ class Settings(BaseSettings):
     DEBUG: bool = False
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
+    # Accounts allowed to use the /admin endpoints
+    ADMIN_EMAILS: List[str] = []
+    # Password hashing (bcrypt cost and the dedicated process pool)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    # Verified JWT cache (entries expire with the token)
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    # Authenticated user lookup cache
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_MAXSIZE: int = 10000
+    # Serialized response cache: "memory", "none", or "module:factory"
+    # naming a callable that returns a backend with get/set/clear/stats
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAXSIZE: int = 10000
+    # Prometheus-format /metrics endpoint and the request/DB timing feeding it
+    METRICS_ENABLED: bool = True
+    # Log requests that exceed their route's query budget or repeat one
+    # statement shape N_PLUS_ONE_THRESHOLD+ times (see query_budget)
+    QUERY_BUDGET_MIDDLEWARE: bool = False
+    N_PLUS_ONE_THRESHOLD: int = 10
+    # Per-statement timings for /admin/slow-queries; statements slower
+    # than the threshold are logged with their query plan
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 100.0
+    SLOW_QUERY_MAX_FINGERPRINTS: int = 1000
+    # Requests carrying a token from /admin/profile-token run under cProfile
+    PROFILING_ENABLED: bool = True
+    PROFILE_DIR: str = "./profiles"
+    PROFILE_TOKEN_TTL_SECONDS: int = 300
+    PROFILE_MAX_FILES: int = 100  # oldest profiles are deleted beyond this
     # Database
     DATABASE_URL: str = "sqlite:///./healthsync.db"
+    # Create missing tables during app startup; turn off when schema setup
+    # runs as its own step (python -m app.core.database)
+    AUTO_CREATE_SCHEMA: bool = True
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800  # seconds, -1 disables
+    # Store health records in monthly tables (see partition_service;
+    # migrate existing rows before enabling)
+    RECORD_PARTITIONING: bool = False
+    # File imports
+    IMPORT_DIR: str = "./imports"
+    IMPORT_CHUNK_SIZE: int = 5000  # rows per committed chunk
+    IMPORT_MAX_BYTES: int = 1024 * 1024 * 1024
+    IMPORT_STALE_SECONDS: int = 300  # running jobs idle this long may be resumed
+    # Retention per measurement type: raw samples are kept raw_days, then
+    # rolled into hourly aggregates, which become daily after hourly_days.
+    # Types not listed are never compacted
+    RETENTION_POLICIES: Dict[str, Dict[str, int]] = {
+        "heart_rate": {"raw_days": 30, "hourly_days": 365},
+        "steps": {"raw_days": 30, "hourly_days": 365},
+        "calories_burned": {"raw_days": 30, "hourly_days": 365},
+    }
+    RETENTION_BATCH_SIZE: int = 5000  # rows compacted per transaction
+    RETENTION_INTERVAL_SECONDS: int = 0  # run compaction in-process this often; 0 = off, use the CLI
+    # SQLite pragmas, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -64000  # negative = KiB, so 64 MB
+    SQLITE_MMAP_SIZE: int = 268435456  # bytes, 256 MB
+    SQLITE_TEMP_STORE: str = "MEMORY"
 
     class Config:
         env_file = ".env"
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache
+def get_settings() -> Settings:
+    """Settings read from the environment and .env, built on first use"""
+    return Settings()
+
+
+class LazySettings:
+    """
+    Stand-in for the Settings instance that builds it on first access
+    Importing this module reads no environment or .env file
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+
+settings = LazySettings()
@@ -1,20 +1,171 @@
-from sqlalchemy import create_engine
+import importlib
+import pkgutil
+import threading
+from typing import Optional
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.query_budget import track_queries
+from app.core.slow_queries import track_slow_queries
 
 
-# Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+# Async drivers for each supported sync dialect
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Convert a sync database URL to its async driver equivalent
+    e.g. sqlite:///./healthsync.db -> sqlite+aiosqlite:///./healthsync.db
+    """
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme:
+        # Driver given explicitly, assume it is already async
+        return url
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def is_sqlite(url: str) -> bool:
+    """True for any SQLite URL, sync or async driver"""
+    return url.startswith("sqlite")
+
+
+def engine_options(url: str, use_async: bool = False) -> dict:
+    """
+    Pool options from settings for create_engine/create_async_engine
+    In-memory SQLite uses a single-connection pool that takes none
+    """
+    if is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return {}
+    return {
+        # Set explicitly; some drivers (aiosqlite) default to NullPool
+        "poolclass": AsyncAdaptedQueuePool if use_async else QueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def upsert_insert(db):
+    """Pick the dialect insert that supports ON CONFLICT DO UPDATE"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Connect hook applying the SQLite pragmas from settings
+    WAL lets readers run alongside a writer, and busy_timeout makes
+    concurrent writers wait instead of failing with "database is locked"
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}")
+    finally:
+        cursor.close()
+
+
+def install_engine_hooks(sync_engine, url: str) -> None:
+    """Connection pragmas and the statement instrumentation enabled in settings"""
+    if is_sqlite(url):
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+    # Statement counts and timings for /metrics
+    if settings.METRICS_ENABLED:
+        instrument_engine(sync_engine)
+    if settings.QUERY_BUDGET_MIDDLEWARE:
+        track_queries(sync_engine)
+    if settings.SLOW_QUERY_LOG_ENABLED:
+        track_slow_queries(sync_engine)
+
+
+# Engines are created on first use rather than at import, so importing
+# the app (tests, CLIs, worker boot) opens no connections
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_engines_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """The sync engine, created on first call"""
+    global _engine
+    if _engine is None:
+        with _engines_lock:
+            if _engine is None:
+                url = settings.DATABASE_URL
+                engine = create_engine(
+                    url,
+                    connect_args={"check_same_thread": False} if is_sqlite(url) else {},
+                    **engine_options(url)
+                )
+                install_engine_hooks(engine, url)
+                _engine = engine
+    return _engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """The async engine used by the API routes, created on first call"""
+    global _async_engine
+    if _async_engine is None:
+        with _engines_lock:
+            if _async_engine is None:
+                url = settings.DATABASE_URL
+                engine = create_async_engine(to_async_url(url), **engine_options(url, use_async=True))
+                install_engine_hooks(engine.sync_engine, url)
+                _async_engine = engine
+    return _async_engine
+
+
+def __getattr__(name: str):
+    """`engine` and `async_engine` as module attributes, created on access"""
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LazySession(Session):
+    """Session bound to get_engine() unless given a bind"""
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_engine(), **kwargs)
+
+
+class LazyAsyncSession(AsyncSession):
+    """AsyncSession bound to get_async_engine() unless given a bind"""
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_async_engine(), **kwargs)
+
 
 # Create session factory
 SessionLocal = sessionmaker(
+    class_=LazySession,
     autocommit=False,
+    autoflush=False
+)
+
+# Async session factory; objects stay readable after commit since
+# lazy loads are not possible outside the event loop
+AsyncSessionLocal = async_sessionmaker(
+    class_=LazyAsyncSession,
     autoflush=False,
-    bind=engine
+    expire_on_commit=False
 )
 
 Base = declarative_base()
@@ -30,3 +181,47 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Database dependency that provides an async database session
+    for FastAPI
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_session_factory():
+    """
+    Dependency providing the sync session factory
+    For background jobs that run after the request has finished
+    """
+    return SessionLocal
+
+
+def get_async_session_factory():
+    """
+    Dependency providing the async session factory itself
+    For responses that outlive the request, e.g. streaming exports,
+    which open and close their own session while the body is sent
+    """
+    return AsyncSessionLocal
+
+
+def create_schema(bind=None) -> None:
+    """
+    Create any missing tables, for every model in app.models
+    Run by the app's startup when AUTO_CREATE_SCHEMA is set, otherwise
+    once per deploy with `python -m app.core.database`
+    """
+    import app.models
+
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f"app.models.{module.name}")
+    Base.metadata.create_all(bind=bind if bind is not None else get_engine())
+
+
+if __name__ == "__main__":
+    create_schema()
+    print(f"Schema ready on {get_engine().url.render_as_string(hide_password=True)}")
@@ -1,18 +1,99 @@
-from fastapi import Depends, HTTPException, status
+from dataclasses import dataclass
+from datetime import date, datetime, timezone as dt_timezone
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 
-from .database import get_db
+from .cache import TTLCache
+from .config import settings
+from .database import get_async_db
 from .security import verify_token
 from ..models.user import User
+from ..services.version_service import etag_matches, get_data_version, make_etag
 
 # Security scheme for JWT tokens
 security = HTTPBearer()
 
-def get_current_user(
-    db: Session = Depends(get_db),
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    Lightweight, session-independent copy of an authenticated user
+    Safe to cache across requests, unlike a session-bound User
+    """
+    id: int
+    email: str
+    is_active: bool
+    birth_date: Optional[date]
+    created_at: datetime
+    timezone: str
+
+    # Same calculation as the model
+    age = User.age
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=user.is_active,
+            birth_date=user.birth_date,
+            created_at=user.created_at,
+            timezone=user.timezone
+        )
+
+
+# Authenticated users by id, so most requests skip the users table
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    Drop a cached user snapshot
+    Call after changing a user outside the ORM (e.g. bulk UPDATEs);
+    ORM updates and deletes are handled by the events below
+    """
+    user_cache.invalidate(int(user_id))
+
+
+# Session.info key of the user ids a transaction has changed
+_CHANGED_USERS = "changed_user_ids"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # The flush runs before commit, and a concurrent request can still
+    # cache the committed old row until then, so the id is invalidated
+    # again once the transaction commits
+    invalidate_user(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_CHANGED_USERS, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop(_CHANGED_USERS, ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_users(session, previous_transaction):
+    session.info.pop(_CHANGED_USERS, None)
+
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> User:
+) -> CurrentUser:
     """Get current authenticated user from JWT token"""
 
     # Extract token
@@ -20,17 +101,23 @@ def get_current_user(
 
     # Verify token, get user ID
     user_id = verify_token(token)
-    if user_id is None:
+    if user_id is None or not user_id.isdigit():
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"}
         )
+
+    user_id = int(user_id)
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
     
-    user = db.query(User).filter(
+    result = await db.execute(select(User).filter(
         User.id == user_id,
         User.is_active == True
-    ).first()
+    ))
+    user = result.scalars().first()
 
     if user is None:
         raise HTTPException(
@@ -39,4 +126,67 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    return user
\ No newline at end of file
+    current_user = CurrentUser.from_user(user)
+    user_cache.set(user_id, current_user)
+    return current_user
+
+
+async def get_admin_user(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    """Current user, who must be listed in ADMIN_EMAILS"""
+    if current_user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+
+async def get_current_data_version(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+) -> int:
+    """
+    The current user's data version
+    Resolved once per request and shared by the ETag check and caching
+    """
+    return await db.run_sync(get_data_version, current_user.id)
+
+
+def _conditional_get(request: Request, response: Response, user_id: int,
+                     version: int, extra: tuple = ()) -> str:
+    """Shared body of the ETag dependencies below"""
+    params = request.query_params.multi_items() + list(extra)
+    etag = make_etag(user_id, version, request.url.path, params)
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    return etag
+
+
+async def check_data_etag(
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    version: int = Depends(get_current_data_version)
+) -> str:
+    """
+    Conditional GET for views of the user's health data
+    The ETag covers the user's data version, the path and the query
+    parameters. A matching If-None-Match is answered with 304 before the
+    endpoint runs. Returns the ETag for endpoints that build their own
+    Response; it is already set on the default one.
+    """
+    return _conditional_get(request, response, current_user.id, version)
+
+
+async def check_daily_data_etag(
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    version: int = Depends(get_current_data_version)
+) -> str:
+    """check_data_etag for views that also change with the UTC date (streaks)"""
+    today = datetime.now(dt_timezone.utc).date().isoformat()
+    return _conditional_get(request, response, current_user.id, version, (("utc_date", today),))
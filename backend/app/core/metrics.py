@@ -0,0 +1,301 @@
+"""
+In-process metrics in the Prometheus text exposition format
+
+MetricsMiddleware records per-route request latency, status codes and
+in-flight requests. instrument_engine hooks an engine's cursor events
+so every statement counts towards the request it ran for, giving
+per-request query counts and DB time alongside the latency. /metrics
+renders it all, plus the registered caches' stats.
+
+Routes are labelled by their path template (/api/v1/health/imports/{job_id}),
+and requests that match no route share one label, to bound cardinality.
+"""
+
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+UNMATCHED_ROUTE = "unmatched"
+
+Labels = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic count per label set"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[Tuple[str, Labels, Sequence[str], float]]:
+        with self._lock:
+            return [(self.name, self.labelnames, labels, value) for labels, value in self._values.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down"""
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> [per-bucket counts, sum, count]
+        self._values: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Labels, value: float) -> None:
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[Tuple[str, Labels, Sequence[str], float]]:
+        bucket_names = self.labelnames + ("le",)
+        samples = []
+        with self._lock:
+            for labels, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", bucket_names, labels + (_format_value(bound),), cumulative))
+                samples.append((f"{self.name}_sum", self.labelnames, labels, total))
+                samples.append((f"{self.name}_count", self.labelnames, labels, count))
+        return samples
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class MetricsRegistry:
+    """
+    Named metrics plus collectors evaluated at scrape time
+    A collector returns metrics built on the fly, e.g. from cache stats
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors: List[Callable[[], list]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format"""
+        lines = []
+        collected = [metric for collector in self.collectors for metric in collector()]
+        for metric in self.metrics + collected:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labelnames, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Reset every metric, e.g. between tests"""
+        for metric in self.metrics:
+            metric.clear()
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+http_request_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements issued per HTTP request", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS
+))
+http_request_db_seconds = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per HTTP request", ("method", "route"),
+    buckets=DB_TIME_BUCKETS
+))
+db_queries_total = registry.register(Counter(
+    "db_queries_total", "SQL statements executed, in or outside requests"
+))
+db_query_duration_seconds = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", buckets=DB_TIME_BUCKETS
+))
+
+
+@dataclass
+class RequestStats:
+    """DB work done on behalf of one request"""
+    queries: int = 0
+    db_seconds: float = 0.0
+    # Set once the response is sent; background tasks run after that
+    # in the same context but aren't part of the request's cost
+    finished: bool = False
+
+
+# Set by MetricsMiddleware for the duration of each request; the DB
+# hooks run in the request's context, including run_sync greenlets and
+# threadpool workers, which copy it
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    db_queries_total.inc()
+    db_query_duration_seconds.observe((), elapsed)
+    stats = current_request.get()
+    if stats is not None and not stats.finished:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_engine(engine) -> None:
+    """
+    Time every statement an engine executes
+    For an AsyncEngine pass its sync_engine
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def register_caches(caches: Dict[str, object]) -> None:
+    """
+    Export cache stats, read at scrape time
+    caches maps a label to a cache with a stats() method; None (a
+    disabled cache) is skipped
+    """
+    def collect() -> list:
+        metrics = {}
+        for name, cache in caches.items():
+            if cache is None:
+                continue
+            for key, value in cache.stats().items():
+                if key == "hit_ratio":
+                    continue
+                kind = Counter if key in ("hits", "misses", "evictions") else Gauge
+                suffix = f"{key}_total" if kind is Counter else key
+                metric = metrics.get(suffix)
+                if metric is None:
+                    metric = metrics[suffix] = kind(f"cache_{suffix}", f"Cache {key.replace('_', ' ')}", ("cache",))
+                metric.inc((name,), value)
+        return list(metrics.values())
+
+    registry.collectors.append(collect)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and DB work per route
+    Pure ASGI rather than BaseHTTPMiddleware so streaming responses are
+    timed to their last byte and no extra task is spawned per request
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        stats = RequestStats()
+        elapsed = None
+
+        def finish():
+            # Latency and DB work stop at the last byte of the response,
+            # not when Starlette's background tasks are done
+            nonlocal elapsed
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+                stats.finished = True
+                http_requests_in_flight.dec()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        token = current_request.set(stats)
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            current_request.reset(token)
+
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", UNMATCHED_ROUTE))
+            http_requests_total.inc(labels + (str(status_code),))
+            http_request_duration_seconds.observe(labels, elapsed)
+            http_request_db_queries.observe(labels, stats.queries)
+            http_request_db_seconds.observe(labels, stats.db_seconds)
@@ -0,0 +1,137 @@
+"""
+Opt-in profiling of single requests
+
+A request carrying a valid profile token, either in the X-Profile header
+or as the _profile query parameter, runs under cProfile. The stats are
+written to PROFILE_DIR, and the response's X-Profile-Id header names
+them for GET /admin/profiles/{id}. Admins mint tokens with
+POST /admin/profile-token. A token is an HMAC of its expiry under
+SECRET_KEY, so it can be checked without touching the database.
+
+Requests without a token only pay for a header and query-string scan.
+cProfile follows the event loop thread, so work offloaded to the
+threadpool shows up as the await it is, and requests interleaving with
+the profiled one are included too. One request is profiled at a time;
+others carrying a token meanwhile are served unprofiled.
+"""
+
+import cProfile
+import hashlib
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from typing import Optional
+from urllib.parse import parse_qs
+
+from .config import settings
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_PARAM = "_profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+_profiling = threading.Lock()
+
+
+def _signature(expires_at: int) -> str:
+    return hmac.new(
+        settings.SECRET_KEY.encode(), f"profile:{expires_at}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def create_profile_token(ttl: Optional[int] = None) -> tuple:
+    """A token valid for ttl seconds (PROFILE_TOKEN_TTL_SECONDS); returns (token, expires_at)"""
+    expires_at = int(time.time()) + (ttl or settings.PROFILE_TOKEN_TTL_SECONDS)
+    return f"{expires_at}.{_signature(expires_at)}", expires_at
+
+
+def verify_profile_token(token: str) -> bool:
+    """Whether a client-supplied token is unexpired and ours; never raises"""
+    expires, _, signature = token.partition(".")
+    # isdigit() alone accepts non-ASCII digits int() rejects, e.g. "²"
+    if not (expires.isascii() and expires.isdigit()) or int(expires) < time.time():
+        return False
+    # Bytes, as compare_digest refuses non-ASCII str
+    return hmac.compare_digest(
+        signature.encode("utf-8", "surrogateescape"), _signature(int(expires)).encode()
+    )
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """Stats file for a profile id, or None for ids that can't be ours"""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    return os.path.join(settings.PROFILE_DIR, f"{profile_id}.prof")
+
+
+def profile_report(path: str, limit: int = 50) -> str:
+    """Top functions by cumulative time, as pstats prints them"""
+    stream = io.StringIO()
+    pstats.Stats(path, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+
+def _prune(directory: str, keep: int) -> None:
+    """Delete the oldest profiles beyond `keep`"""
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".prof")]
+    for path in sorted(paths, key=os.path.getmtime)[:-keep or None]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _requested_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if PROFILE_PARAM.encode() in query:
+        values = parse_qs(query.decode("latin-1")).get(PROFILE_PARAM)
+        if values:
+            return values[0]
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running token-carrying requests under cProfile"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _requested_token(scope)
+        if token is None or not verify_profile_token(token) or not _profiling.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, profile_id.encode())
+                ]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.disable()
+        finally:
+            _profiling.release()
+            os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(profile_path(profile_id))
+            _prune(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
@@ -0,0 +1,162 @@
+"""
+Per-request SQL query budgets and N+1 detection
+
+track_queries hooks an engine so each statement is recorded against the
+request it ran for. QueryBudgetMiddleware then checks every request:
+
+  * against its route's budget, declared with @query_budget(n) on the
+    endpoint
+  * for N+1 patterns: the same statement shape (literals and IN/VALUES
+    lists collapsed) issued N_PLUS_ONE_THRESHOLD times or more, unless
+    the route repeats statements by design (allow_repeats)
+
+Violations are logged and passed to violation_listeners. The test suite
+registers one to fail any test whose requests break a budget, and
+production can enable the middleware with QUERY_BUDGET_MIDDLEWARE to log
+them.
+"""
+
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+UNMATCHED_ROUTE = "unmatched"
+
+# Placeholders for the sqlite/qmark and postgres/pyformat, numeric styles
+_PLACEHOLDER = r"(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_REPEATED_GROUPS = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a statement so calls differing only in values compare equal
+    Literals become ?, and placeholder lists of any length (IN lists,
+    multi-row VALUES) collapse to (?)
+    """
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    shape = _REPEATED_GROUPS.sub(r"\1", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+@dataclass
+class RequestQueries:
+    """Statements one request issued, and what the checks found"""
+    method: str
+    route: str
+    budget: Optional[int] = None
+    allow_repeats: bool = False
+    statements: List[str] = field(default_factory=list)
+    # Set once the response is sent; background tasks run after that
+    # in the same context but aren't part of the request's cost
+    finished: bool = False
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Statement shapes issued at least threshold times"""
+        shapes = Counter(statement_shape(statement) for statement in self.statements)
+        return {shape: n for shape, n in shapes.items() if n >= threshold}
+
+    def violations(self, threshold: int) -> List[str]:
+        """Budget overruns and N+1 patterns, one message each"""
+        messages = []
+        if self.budget is not None and self.count > self.budget:
+            messages.append(f"{self.count} queries, budget {self.budget}")
+        if not self.allow_repeats:
+            for shape, n in self.repeated(threshold).items():
+                messages.append(f"N+1: {n}x {shape[:200]}")
+        return messages
+
+
+# The request being tracked, set by QueryBudgetMiddleware
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_queries", default=None)
+
+# Called with (RequestQueries, messages) for every request with violations
+violation_listeners: List[Callable[[RequestQueries, List[str]], None]] = []
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = current_queries.get()
+    if queries is not None and not queries.finished:
+        queries.statements.append(statement)
+
+
+def track_queries(engine) -> None:
+    """
+    Record an engine's statements against the current request
+    For an AsyncEngine pass its sync_engine
+    """
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def query_budget(max_queries: Optional[int] = None, allow_repeats: bool = False):
+    """
+    Declare the most statements a route may issue per request
+    Apply below the router decorator:
+
+        @router.get("/summary")
+        @query_budget(4)
+        async def get_health_summary(...):
+
+    allow_repeats exempts the route from the N+1 check, for work that
+    repeats the same statements per chunk, such as bulk ingestion
+    """
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        endpoint.allow_repeats = allow_repeats
+        return endpoint
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware checking each request's statements against its route's budget"""
+
+    def __init__(self, app, n_plus_one_threshold: int = 10):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(method=scope["method"], route=UNMATCHED_ROUTE)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                queries.finished = True
+            await send(message)
+
+        token = current_queries.set(queries)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_queries.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                queries.route = route.path
+                queries.budget = getattr(route.endpoint, "query_budget", None)
+                queries.allow_repeats = getattr(route.endpoint, "allow_repeats", False)
+
+            messages = queries.violations(self.n_plus_one_threshold)
+            if messages:
+                logger.warning("Query budget violation on %s %s: %s",
+                               queries.method, queries.route, "; ".join(messages))
+                for listener in violation_listeners:
+                    listener(queries, messages)
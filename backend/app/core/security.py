@@ -1,10 +1,24 @@
+import asyncio
+import hashlib
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta, timezone
+from .cache import TTLCache
 from .config import settings
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+# Verified tokens by SHA-256 of the token; each entry expires with its token
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, ttl=0)
 
 
 def hash_password(password: str) -> str:
@@ -17,6 +31,81 @@ def verify_password(password: str, hashed_password: str) -> bool:
     return pwd_context.verify(password, hashed_password)
 
 
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool has no room for more work"""
+
+
+class PasswordHashPool:
+    """
+    Dedicated process pool for bcrypt work
+    Keeps hashing off the request threadpool and outside the GIL, and
+    rejects new work immediately once max_pending jobs are in flight
+    so a login burst cannot queue up behind itself
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start worker processes on first use"""
+        if self._executor is None:
+            # spawn, not fork: the parent has event loop and driver threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in a worker process, or raise PasswordHasherBusy"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise PasswordHasherBusy()
+            self.pending += 1
+            executor = self._get_executor()
+
+        # Release on completion of the job itself, even if the request
+        # awaiting it is cancelled
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        """Stop worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+password_pool = PasswordHashPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the password pool"""
+    return await password_pool.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """Verify a password on the password pool"""
+    return await password_pool.run(verify_password, password, hashed_password)
+
+
 def create_access_token(subject: str, expires_delta: timedelta = None) -> str:
     """ 
     Create a JWT access token for user login
@@ -46,7 +135,14 @@ def verify_token(token: str) -> str:
     """
     Verify and decode JWT token
     Returns the user ID if valid, None if invalid
+    Successful verifications are cached until the token's exp, so a
+    reused token skips signature checks; failures are never cached
     """
+    key = hashlib.sha256(token.encode()).digest()
+    user_id = token_cache.get(key)
+    if user_id is not None:
+        return user_id
+
     try:
         # Decode
         payload = jwt.decode(
@@ -57,6 +153,13 @@ def verify_token(token: str) -> str:
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
+
+        # Tokens without exp never expire, so only cache those that do
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            remaining = exp - time.time()
+            if remaining > 0:
+                token_cache.set(key, user_id, expires_at=time.monotonic() + remaining)
         
         return user_id
 
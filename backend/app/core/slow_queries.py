@@ -0,0 +1,209 @@
+"""
+Slow-query log and per-fingerprint statement timings
+
+track_slow_queries times every statement an engine runs and files it
+under its fingerprint (statement_shape). Statements slower than
+SLOW_QUERY_THRESHOLD_MS are logged with the shape of their bound
+parameters, the route that issued them and the query plan. The plan is
+captured from the same connection with EXPLAIN QUERY PLAN on SQLite or
+EXPLAIN on PostgreSQL, once per fingerprint.
+
+slow_query_log keeps count, total, max and recent durations per
+fingerprint for the admin top-N report.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from .config import settings
+from .query_budget import statement_shape
+
+logger = logging.getLogger(__name__)
+
+# Durations kept per fingerprint for the p95
+RECENT_SAMPLES = 512
+# Statement kinds whose plan can be shown without running them
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# ASGI scope of the request being served, set by SlowQueryMiddleware
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+
+# Statements repeat, so their shapes are worth caching
+fingerprint = lru_cache(maxsize=4096)(statement_shape)
+
+
+class FingerprintStats:
+    """Timings for one statement fingerprint"""
+
+    def __init__(self, statement: str):
+        self.statement = statement
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow_count = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self.plan: Optional[List[str]] = None
+        self.params: Optional[str] = None
+        self.route: Optional[str] = None
+
+    def p95(self) -> float:
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+
+    def report(self) -> dict:
+        return {
+            "fingerprint": self.statement,
+            "count": self.count,
+            "slow_count": self.slow_count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000,
+            "p95_ms": self.p95() * 1000,
+            "max_ms": self.max * 1000,
+            "last_route": self.route,
+            "params": self.params,
+            "plan": self.plan
+        }
+
+
+class SlowQueryLog:
+    """
+    Statement timings by fingerprint, bounded to maxsize fingerprints
+    When full, the fingerprint with the least total time is dropped
+    """
+
+    def __init__(self, maxsize: Optional[int] = None):
+        # None reads SLOW_QUERY_MAX_FINGERPRINTS when first needed
+        self._maxsize = maxsize
+        self._stats: Dict[str, FingerprintStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed: float) -> FingerprintStats:
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is None:
+                if len(self._stats) >= (self._maxsize or settings.SLOW_QUERY_MAX_FINGERPRINTS):
+                    del self._stats[min(self._stats, key=lambda key: self._stats[key].total)]
+                stats = self._stats[statement] = FingerprintStats(statement)
+            stats.count += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            stats.recent.append(elapsed)
+            return stats
+
+    def mark_slow(self, stats: FingerprintStats, params: str, route: Optional[str]) -> None:
+        """Note a slow execution's parameter shape and route"""
+        with self._lock:
+            stats.slow_count += 1
+            stats.params = params
+            stats.route = route
+
+    def top(self, limit: int = 20, order_by: str = "total") -> List[dict]:
+        """The `limit` fingerprints with the most total time, or the highest p95"""
+        with self._lock:
+            reports = [stats.report() for stats in self._stats.values()]
+        key = "p95_ms" if order_by == "p95" else "total_ms"
+        return sorted(reports, key=lambda report: report[key], reverse=True)[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """Types of the bound parameters, never their values"""
+    if executemany:
+        rows = len(parameters)
+        return f"{rows} x {parameter_shape(parameters[0], False)}" if rows else "[]"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters or ()) + ")"
+
+
+def explain(conn, statement: str, parameters, executemany: bool) -> Optional[List[str]]:
+    """Query plan for a statement, run on the connection that executed it"""
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return None
+
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    # A raw DBAPI cursor, so the EXPLAIN doesn't re-enter these hooks
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    except Exception:
+        logger.debug("Could not explain statement", exc_info=True)
+        return None
+    finally:
+        cursor.close()
+    # SQLite rows are (id, parent, notused, detail)
+    return [str(row[-1]) for row in rows]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._slow_query_started
+    stats = slow_query_log.record(fingerprint(statement), elapsed)
+    if elapsed * 1000 < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    scope = current_scope.get()
+    route = getattr(scope.get("route"), "path", scope["path"]) if scope is not None else None
+    params = parameter_shape(parameters, executemany)
+    plan = stats.plan
+    if plan is None:
+        plan = stats.plan = explain(conn, statement, parameters, executemany)
+    slow_query_log.mark_slow(stats, params, route)
+
+    logger.warning(
+        "Slow query (%.1f ms) on %s: %s | params %s | plan: %s",
+        elapsed * 1000, route or "-", stats.statement, params, " / ".join(plan or ["-"])
+    )
+
+
+def track_slow_queries(engine) -> None:
+    """
+    Time an engine's statements and log the slow ones
+    For an AsyncEngine pass its sync_engine
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SlowQueryMiddleware:
+    """ASGI middleware exposing the request's scope to the slow-query log"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
@@ -1,19 +1,53 @@
 """CORE API METHODS"""
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from .core.database import engine, Base
+from fastapi.responses import JSONResponse, Response
+from .core.config import settings
+from .core.database import SessionLocal, create_schema
+from .core.deps import user_cache
+from .core.metrics import MetricsMiddleware, register_caches, registry
+from .core.profiling import ProfilingMiddleware
+from .core.query_budget import QueryBudgetMiddleware
+from .core.slow_queries import SlowQueryMiddleware
+from .core.security import password_pool, token_cache
+from .services.retention_service import compaction_loop
+from .api.admin import router as admin_router
 from .api.auth import router as auth_router
-from .api.health import router as health_router
+from .api.health import router as health_router, response_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown"""
+    # Schema setup happens here, once per process, not at import
+    if settings.AUTO_CREATE_SCHEMA:
+        create_schema()
+
+    # Periodic retention compaction, when not left to cron
+    compaction = None
+    if settings.RETENTION_INTERVAL_SECONDS > 0:
+        compaction = asyncio.create_task(
+            compaction_loop(SessionLocal, settings.RETENTION_INTERVAL_SECONDS)
+        )
+
+    yield
+
+    if compaction is not None:
+        compaction.cancel()
+    # Stop password hashing worker processes; queued jobs are cancelled,
+    # and waiting for running ones happens off the event loop
+    await run_in_threadpool(password_pool.shutdown)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="HealthSync API",
     description="Health and wellness optimization platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +58,27 @@ app.add_middleware(
 )
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(health_router, prefix="/api/v1")
+app.include_router(admin_router, prefix="/api/v1")
+
+if settings.SLOW_QUERY_LOG_ENABLED:
+    app.add_middleware(SlowQueryMiddleware)
+
+if settings.QUERY_BUDGET_MIDDLEWARE:
+    app.add_middleware(QueryBudgetMiddleware, n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD)
+
+if settings.METRICS_ENABLED:
+    # Outside the app's own middleware, so it times CORS and the rest
+    app.add_middleware(MetricsMiddleware)
+    register_caches({"user": user_cache, "token": token_cache, "response": response_cache})
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+if settings.PROFILING_ENABLED:
+    # Outermost, so a profile covers the other middleware too
+    app.add_middleware(ProfilingMiddleware)
 
 
 @app.exception_handler(Exception)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from ..core.database import Base
+
+
+class UserDataVersion(Base):
+    """
+    Per-user counter bumped by every write to the user's health data
+    Read endpoints derive their ETag from it
+    """
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
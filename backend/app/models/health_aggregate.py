@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index
+from ..core.database import Base
+
+
+class HealthRecordAggregate(Base):
+    """
+    Downsampled health records: statistics of the raw samples in one
+    hour or day, written by the retention compaction job
+    """
+    __tablename__ = "health_record_aggregates"
+    __table_args__ = (
+        # Serves series queries across both resolutions
+        Index("ix_health_record_aggregates_user_type_bucket", "user_id", "measurement_type", "bucket_start"),
+    )
+
+    # Composite Primary Key
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    measurement_type = Column(String(100), primary_key=True)
+    resolution = Column(String(10), primary_key=True)  # "hour" or "day"
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+
+    unit = Column(String(50), nullable=False)
+
+    # Statistics of the compacted samples
+    sample_count = Column(Integer, nullable=False)
+    value_sum = Column(Float, nullable=False)
+    value_sum_sq = Column(Float, nullable=False)
+    value_min = Column(Float, nullable=False)
+    value_max = Column(Float, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -6,6 +6,12 @@ from ..core.database import Base
 class HealthRecord(Base):
     """Database model for health measurements"""
     __tablename__ = "health_records"
+    __table_args__ = (
+        # Serves the filtered listing (user + type + date range)
+        Index("ix_health_records_user_type_measured", "user_id", "measurement_type", "measured_at"),
+        # Serves the unfiltered, newest-first listing and keyset pagination
+        Index("ix_health_records_user_measured", "user_id", "measured_at", "id"),
+    )
 
     # Primary Key
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -24,4 +30,3 @@ class HealthRecord(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="health_records")
-    
\ No newline at end of file
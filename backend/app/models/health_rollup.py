@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey
+from ..core.database import Base
+
+
+class HealthRecordRollup(Base):
+    """
+    Per-user, per-measurement-type running totals of health records
+    Kept up to date on every insert so the summary never scans records
+    """
+    __tablename__ = "health_record_rollups"
+
+    # Composite Primary Key
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    measurement_type = Column(String(100), primary_key=True)
+
+    # Running aggregates
+    record_count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0.0)
+    value_sum_sq = Column(Float, nullable=False, default=0.0)
+
+    # Measurement time range and the most recent value
+    first_measured_at = Column(DateTime(timezone=True), nullable=False)
+    last_measured_at = Column(DateTime(timezone=True), nullable=False)
+    last_value = Column(Float, nullable=False)
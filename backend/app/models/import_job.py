@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, BigInteger
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+
+class ImportJob(Base):
+    """Background import of an uploaded health data file"""
+    __tablename__ = "import_jobs"
+
+    # Primary Key
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    # Foreign Key to users table
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    # Upload
+    file_format = Column(String(20), nullable=False)
+    file_path = Column(String(500), nullable=False)
+    column_map = Column(Text, nullable=True)  # JSON {field: source column}
+    bytes_total = Column(BigInteger, nullable=False, default=0)
+
+    # Progress; committed_offset is the file position after the last
+    # committed chunk, so an interrupted job resumes from there
+    status = Column(String(20), nullable=False, default="pending")
+    committed_offset = Column(BigInteger, nullable=False, default=0)
+    rows_inserted = Column(Integer, nullable=False, default=0)
+    rows_failed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from ..core.database import Base
+
+
+class HealthRecordPartition(Base):
+    """
+    Registry of the monthly health record partition tables
+    Read on every routed access, so workers see each other's partitions
+    """
+    __tablename__ = "health_record_partitions"
+
+    table_name = Column(String(100), primary_key=True)
+    # First instant of the month (UTC, naive) the table holds
+    month_start = Column(DateTime, nullable=False, unique=True)
+
+
+class RecordIdSequence(Base):
+    """
+    Shared id counter, so record ids stay unique across partitions
+    next_id is the first id not yet handed out
+    """
+    __tablename__ = "record_id_sequences"
+
+    name = Column(String(100), primary_key=True)
+    next_id = Column(Integer, nullable=False)
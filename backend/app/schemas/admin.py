@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+
+class SlowQueryStat(BaseModel):
+    """Timings for one statement fingerprint"""
+    fingerprint: str = Field(..., description="Statement with literals and value lists collapsed")
+    count: int
+    slow_count: int = Field(..., description="Executions over SLOW_QUERY_THRESHOLD_MS")
+    total_ms: float
+    mean_ms: float
+    p95_ms: float = Field(..., description="Over the most recent executions")
+    max_ms: float
+    last_route: Optional[str] = Field(None, description="Route of the latest slow execution")
+    params: Optional[str] = Field(None, description="Bound parameter types of the latest slow execution")
+    plan: Optional[List[str]] = Field(None, description="Query plan captured on the first slow execution")
+
+
+class SlowQueryReport(BaseModel):
+    """Top statement fingerprints by total or p95 time"""
+    threshold_ms: float
+    order_by: str
+    queries: List[SlowQueryStat]
+
+
+class ProfileToken(BaseModel):
+    """Token that makes a request run under the profiler"""
+    token: str = Field(..., description="Send as the X-Profile header or the _profile query parameter")
+    expires_at: datetime
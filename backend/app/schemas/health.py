@@ -43,6 +43,16 @@ class HealthRecordCreate(BaseModel):
         description="When measurement was taken(default to now)"
     )
 
+    @field_validator('measured_at')
+    @classmethod
+    def normalize_measured_at(cls, v):
+        """Store UTC whichever path writes the record; naive timestamps are taken to already be UTC"""
+        if v is None:
+            return datetime.now(timezone.utc)
+        if v.tzinfo is None:
+            return v.replace(tzinfo=timezone.utc)
+        return v.astimezone(timezone.utc)
+
 
 class HealthRecordResponse(BaseModel):
     """Schema for health record responses"""
@@ -90,6 +100,51 @@ class HealthSummary(BaseModel):
     latest_measurement: List[HealthRecordResponse] = []
 
 
+class SeriesBucketSize(str, Enum):
+    """Time bucket widths for chart series"""
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class SeriesPoint(BaseModel):
+    """Aggregated measurements for one time bucket"""
+    bucket_start: datetime
+    count: int
+    avg: float
+    min: float
+    max: float
+
+
+class HealthSeries(BaseModel):
+    """Schema for time-bucketed chart data"""
+    measurement_type: MeasurementType
+    bucket: SeriesBucketSize
+    points: List[SeriesPoint] = []
+
+
+class FileFormat(str, Enum):
+    """File formats for record exports and imports"""
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class HealthAnalytics(BaseModel):
+    """Schema for per-measurement-type analytics"""
+    measurement_type: MeasurementType
+    count: int
+    mean: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+    rolling_mean: Optional[float] = Field(None, description="Mean of the last `window` samples")
+    trend: Optional[float] = Field(None, description="Latest exponentially weighted average")
+    day_over_day_delta: Optional[float] = Field(None, description="Change in daily mean since the previous day")
+    longest_streak: int = 0
+    current_streak: int = 0
+
+
 class QuickAdd(BaseModel):
     """Schema for quick measurement entry(common patterns)"""
     weight_kg: Optional[float] = Field(None, ge=20, le=500)
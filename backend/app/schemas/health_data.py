@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Email, Field
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Any, List, Optional
 from datetime import datetime, timezone
 
 class SimpleHealthRecord(BaseModel):
@@ -12,8 +12,52 @@ class SimpleHealthRecord(BaseModel):
 
 class BulkHealthRecord(BaseModel):
     """Upload multiple records"""
-    pass
+    # Items stay unvalidated here so one bad sample doesn't reject the batch;
+    # each is validated against HealthRecordCreate during ingestion
+    records: List[Any] = Field(..., description="Health records to insert")
+
+class BulkRecordError(BaseModel):
+    """Validation failure for one item of a bulk upload"""
+    index: int = Field(..., description="Position of the item in the upload")
+    errors: List[dict]
+
+class BulkHealthRecordResult(BaseModel):
+    """Outcome of a bulk upload"""
+    received: int
+    inserted: int
+    failed: int
+    errors: List[BulkRecordError] = []
+
+class ImportJobResponse(BaseModel):
+    """Status and progress of a file import"""
+    id: int
+    status: str = Field(..., description="pending, running, completed or failed")
+    file_format: str
+    bytes_total: int
+    bytes_processed: int = Field(..., description="Bytes covered by committed chunks")
+    progress: float = Field(..., description="Fraction of the file committed (0-1)")
+    rows_inserted: int
+    rows_failed: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_job(cls, job) -> "ImportJobResponse":
+        return cls(
+            id=job.id,
+            status=job.status,
+            file_format=job.file_format,
+            bytes_total=job.bytes_total,
+            bytes_processed=job.committed_offset,
+            progress=job.committed_offset / job.bytes_total if job.bytes_total else 1.0,
+            rows_inserted=job.rows_inserted,
+            rows_failed=job.rows_failed,
+            error=job.error,
+            created_at=job.created_at,
+            updated_at=job.updated_at
+        )
 
 class HealthRecordFilter(BaseModel):
     """Query health data"""
-    pass
\ No newline at end of file
+    pass
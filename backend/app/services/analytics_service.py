@@ -0,0 +1,196 @@
+"""
+Vectorized per-user analytics over NumPy arrays
+
+Series are loaded with a Core select straight into arrays (epoch
+seconds and values), skipping ORM objects and datetime parsing, and
+every calculation below runs on whole arrays at once.
+"""
+
+from dataclasses import dataclass
+from itertools import chain
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models.health_record import HealthRecord
+from .partition_service import record_tables
+
+SECONDS_PER_DAY = 86400
+
+
+@dataclass
+class Series:
+    """One measurement type's samples, ordered by time"""
+    timestamps: np.ndarray  # float64 epoch seconds (UTC)
+    values: np.ndarray  # float64
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def days(self) -> np.ndarray:
+        """UTC day number (days since epoch) of each sample"""
+        return np.floor_divide(self.timestamps, SECONDS_PER_DAY).astype(np.int64)
+
+
+def epoch_expression(dialect_name: str, column=HealthRecord.measured_at):
+    """SQL expression for measured_at as float epoch seconds"""
+    if dialect_name == "postgresql":
+        return func.extract("epoch", column)
+    # julianday keeps sub-second precision, unlike strftime('%s')
+    return (func.julianday(column) - 2440587.5) * SECONDS_PER_DAY
+
+
+def load_series(db: Session, user_id: int, measurement_type: str) -> Series:
+    """
+    Load a user's (measured_at, value) series for one measurement type
+    Served by the (user_id, measurement_type, measured_at) index;
+    partitions are read oldest first, so rows stay in time order
+    """
+    dialect_name = db.get_bind().dialect.name
+    rows = []
+    for table in record_tables(db):
+        stmt = select(epoch_expression(dialect_name, table.c.measured_at), table.c.value).where(
+            table.c.user_id == user_id,
+            table.c.measurement_type == measurement_type
+        ).order_by(table.c.measured_at)
+        rows.extend(db.execute(stmt).all())
+
+    # Flatten (epoch, value) tuples directly into one float buffer
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=2 * len(rows))
+    pairs = flat.reshape(-1, 2)
+    return Series(timestamps=pairs[:, 0].copy(), values=pairs[:, 1].copy())
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing mean over `window` samples
+    The first window-1 entries average over the samples available so far
+    """
+    if len(values) == 0:
+        return values.copy()
+    window = max(1, window)
+    cumsum = np.cumsum(values)
+    sums = cumsum.copy()
+    sums[window:] = cumsum[window:] - cumsum[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def ewma(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Exponentially weighted moving average, seeded with the first value
+    y[0] = x[0]; y[t] = alpha * x[t] + (1 - alpha) * y[t-1]
+    Computed blockwise so decay**-k stays within float range
+    """
+    if len(values) == 0:
+        return values.copy()
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        return values.astype(np.float64)
+
+    # decay**-block must stay well below the float64 maximum (~e**709)
+    block = max(1, int(500 / -np.log(decay))) if decay < 1.0 else len(values)
+
+    out = np.empty(len(values), dtype=np.float64)
+    previous = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        out[start:start + len(chunk)] = powers * (previous + alpha * np.cumsum(chunk / powers))
+        previous = out[start + len(chunk) - 1]
+    return out
+
+
+def percentiles(values: np.ndarray, qs: Sequence[float] = (50, 90, 99)) -> dict:
+    """Requested percentiles of the values, keyed by percentile"""
+    if len(values) == 0:
+        return {q: None for q in qs}
+    return dict(zip(qs, np.percentile(values, qs).tolist()))
+
+
+def daily_means(series: Series):
+    """
+    Mean value per UTC day that has samples
+    Returns (day numbers, means), sorted by day
+    """
+    days, inverse = np.unique(series.days, return_inverse=True)
+    sums = np.bincount(inverse, weights=series.values)
+    counts = np.bincount(inverse)
+    return days, sums / counts
+
+
+def day_over_day_deltas(series: Series):
+    """
+    Change in daily mean from the previous calendar day
+    NaN where the previous day has no samples
+    Returns (day numbers, deltas)
+    """
+    days, means = daily_means(series)
+    deltas = np.full(len(days), np.nan)
+    if len(days) > 1:
+        consecutive = np.diff(days) == 1
+        deltas[1:][consecutive] = np.diff(means)[consecutive]
+    return days, deltas
+
+
+def streaks(days: np.ndarray, latest_day: int) -> dict:
+    """
+    Longest and current runs of consecutive days in `days`
+    The current streak counts back from latest_day (or the day before
+    it, so a streak isn't broken before today's sample arrives)
+    """
+    days = np.unique(days)
+    if len(days) == 0:
+        return {"longest": 0, "current": 0}
+
+    # Runs break wherever consecutive days differ by more than one
+    breaks = np.flatnonzero(np.diff(days) != 1) + 1
+    bounds = np.concatenate(([0], breaks, [len(days)]))
+    lengths = np.diff(bounds)
+
+    current = 0
+    if days[-1] >= latest_day - 1:
+        current = int(lengths[-1])
+    return {"longest": int(lengths.max()), "current": current}
+
+
+def summarize(series: Series, window: int, alpha: float, today: int, streak_min: Optional[float] = None) -> dict:
+    """
+    Headline analytics for one series
+    Streaks count days with samples, or days whose mean is at least
+    streak_min when given (e.g. 10000 steps)
+    """
+    if len(series) == 0:
+        return {
+            "count": 0, "mean": None, "p50": None, "p90": None, "p99": None,
+            "rolling_mean": None, "trend": None, "day_over_day_delta": None,
+            "longest_streak": 0, "current_streak": 0
+        }
+
+    values = series.values
+    pcts = percentiles(values, (50, 90, 99))
+    days, deltas = day_over_day_deltas(series)
+
+    if streak_min is None:
+        streak_days = days
+    else:
+        _, means = daily_means(series)
+        streak_days = days[means >= streak_min]
+    runs = streaks(streak_days, today)
+
+    last_delta = deltas[-1]
+    return {
+        "count": int(len(values)),
+        "mean": float(values.mean()),
+        "p50": pcts[50],
+        "p90": pcts[90],
+        "p99": pcts[99],
+        "rolling_mean": float(rolling_mean(values, window)[-1]),
+        "trend": float(ewma(values, alpha)[-1]),
+        "day_over_day_delta": None if np.isnan(last_delta) else float(last_delta),
+        "longest_streak": runs["longest"],
+        "current_streak": runs["current"]
+    }
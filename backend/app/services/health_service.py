@@ -0,0 +1,364 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import Row, Table, and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from ..models.health_record import HealthRecord
+from ..schemas.health import HealthRecordCreate, SeriesBucketSize
+from ..schemas.health_data import BulkHealthRecord, BulkRecordError
+from .partition_service import insert_record_rows, record_tables
+from .rollup_service import update_rollups_from_rows
+from .version_service import bump_data_version
+
+# Rows per INSERT/commit during bulk ingestion
+BULK_CHUNK_SIZE = 5000
+# Largest batch accepted by a single bulk request
+BULK_MAX_RECORDS = 100_000
+
+# Placeholder for NDJSON lines that were not valid JSON
+_UNPARSEABLE = object()
+
+
+def naive_utc(value: datetime) -> datetime:
+    """
+    Aware datetimes as naive UTC, the form measured_at is stored and
+    compared in; SQLite would otherwise drop the offset when binding
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def filter_records(query, user_id: int, measurement_types=None, start_date=None, end_date=None,
+                   table: Optional[Table] = None):
+    """
+    Apply the standard record filters (owner, types, date range)
+    Shared by listing and export so both accept the same parameters
+    table is the partition being queried; defaults to health_records
+    """
+    columns = (HealthRecord.__table__ if table is None else table).c
+    query = query.filter(columns.user_id == user_id)
+
+    if measurement_types:
+        type_values = [mt.value for mt in measurement_types]
+        query = query.filter(columns.measurement_type.in_(type_values))
+
+    if start_date:
+        query = query.filter(columns.measured_at >= naive_utc(start_date))
+
+    if end_date:
+        query = query.filter(columns.measured_at <= naive_utc(end_date))
+
+    return query
+
+
+def _key_datetime(value: Optional[datetime]) -> str:
+    """Datetime in cache keys, normalized to UTC as filter_records queries it"""
+    if value is None:
+        return ""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.isoformat()
+
+
+def records_cache_key(user_id: int, version: int, measurement_types, start_date, end_date,
+                      limit: int, offset: int, cursor: Optional[str]) -> str:
+    """
+    Response cache key for a page of GET /records
+    Filters are normalized so equivalent queries share an entry: type
+    order and duplicates, timezone spelling and an offset the cursor
+    overrides don't matter
+    """
+    types = ",".join(sorted({t.value for t in measurement_types or []}))
+    position = f"c={cursor}" if cursor else f"o={offset}"
+    return "|".join([
+        "records", str(user_id), str(version), types,
+        _key_datetime(start_date), _key_datetime(end_date), str(limit), position
+    ])
+
+
+def encode_cursor(measured_at: datetime, record_id: int) -> str:
+    """
+    Encode a keyset position as an opaque cursor string
+    Position is the (measured_at, id) of the last record on a page
+    """
+    raw = f"{measured_at.isoformat()}|{record_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """
+    Decode a cursor produced by encode_cursor
+    Returns (measured_at, id) if valid, None if invalid
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        measured_at, record_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(measured_at), int(record_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def apply_keyset(query, measured_at: datetime, record_id: int, table: Optional[Table] = None):
+    """
+    Restrict a newest-first records query to rows after the cursor position
+    Uses (measured_at, id) so ties on measured_at still page deterministically
+    """
+    columns = (HealthRecord.__table__ if table is None else table).c
+    return query.filter(
+        or_(
+            columns.measured_at < measured_at,
+            and_(
+                columns.measured_at == measured_at,
+                columns.id < record_id
+            )
+        )
+    )
+
+
+def list_records(db: Session, user_id: int, measurement_types=None, start_date=None, end_date=None,
+                 limit: int = 50, offset: int = 0,
+                 position: Optional[Tuple[datetime, int]] = None) -> List[Row]:
+    """
+    One newest-first page of a user's records, as RESPONSE_COLUMNS rows
+    position is a decoded cursor and takes precedence over offset.
+    Partitions are read newest first until the page is full; ones an
+    offset skips entirely are only counted.
+    """
+    upper = end_date
+    if position is not None:
+        offset = 0
+        upper = position[0] if end_date is None else min(naive_utc(end_date), naive_utc(position[0]))
+    tables = record_tables(db, start_date, upper, newest_first=True)
+
+    rows = []
+    for table in tables:
+        query = filter_records(
+            select(*response_columns(table)), user_id, measurement_types, start_date, end_date, table
+        )
+        if position is not None:
+            query = apply_keyset(query, *position, table=table)
+
+        if offset and len(tables) > 1:
+            count = db.scalar(select(func.count()).select_from(query.subquery()))
+            if count <= offset:
+                offset -= count
+                continue
+
+        # Stable newest-first order; id breaks ties between equal timestamps
+        query = query.order_by(table.c.measured_at.desc(), table.c.id.desc())
+        if offset:
+            query = query.offset(offset)
+            offset = 0
+
+        rows.extend(db.execute(query.limit(limit - len(rows))).all())
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+# SQLite strftime/date() forms of each bucket start, as ISO strings
+_SQLITE_BUCKETS = {
+    SeriesBucketSize.HOUR: lambda col: func.strftime("%Y-%m-%dT%H:00:00", col),
+    SeriesBucketSize.DAY: lambda col: func.date(col),
+    # Monday of the week: step to the coming Sunday, then back six days
+    SeriesBucketSize.WEEK: lambda col: func.date(col, "weekday 0", "-6 days"),
+    SeriesBucketSize.MONTH: lambda col: func.strftime("%Y-%m-01", col),
+}
+
+
+def bucket_expression(dialect_name: str, bucket: SeriesBucketSize, column=HealthRecord.measured_at):
+    """
+    SQL expression truncating measured_at to the start of its bucket
+    Weeks start on Monday
+    """
+    if dialect_name == "postgresql":
+        return func.date_trunc(bucket.value, column)
+    return _SQLITE_BUCKETS[bucket](column)
+
+
+def parse_bucket_start(value) -> datetime:
+    """Bucket keys come back as ISO strings on SQLite, datetimes elsewhere"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def insert_records_returning(db: Session, rows: List[dict]) -> List[Row]:
+    """
+    Insert rows and read back id/created_at from the same statement
+    Uses one multi-row INSERT ... RETURNING per partition, so no per-row
+    SELECT is needed after commit. Rows come back in the order they were
+    given.
+    """
+    return insert_record_rows(db, rows, returning=True)
+
+
+def parse_bulk_payload(body: bytes, ndjson: bool) -> Tuple[List[Any], List[BulkRecordError]]:
+    """
+    Split a bulk upload into raw items
+    JSON bodies may be an array or {"records": [...]}; NDJSON has one
+    record per line. Unparseable NDJSON lines are reported as item errors.
+    Raises ValueError if the body as a whole is unreadable.
+    """
+    if not ndjson:
+        payload = json.loads(body)
+        if isinstance(payload, dict):
+            payload = BulkHealthRecord.model_validate(payload).records
+        if not isinstance(payload, list):
+            raise ValueError("Expected a JSON array of records")
+        return payload, []
+
+    items, errors = [], []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            errors.append(BulkRecordError(
+                index=len(items),
+                errors=[{"loc": [], "msg": f"Invalid JSON: {e}", "type": "json_invalid"}]
+            ))
+            items.append(_UNPARSEABLE)
+    return items, errors
+
+
+def validate_bulk_items(user_id: int, items: List[Any]) -> Tuple[List[dict], List[BulkRecordError]]:
+    """
+    Validate every item against HealthRecordCreate in one pass
+    Returns insertable row dicts and the errors of rejected items
+    """
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        if item is _UNPARSEABLE:
+            continue
+        try:
+            record = HealthRecordCreate.model_validate(item)
+        except ValidationError as e:
+            errors.append(BulkRecordError(
+                index=index,
+                errors=e.errors(include_url=False, include_context=False, include_input=False)
+            ))
+            continue
+
+        rows.append({
+            "user_id": user_id,
+            "measurement_type": record.measurement_type.value,
+            "value": record.value,
+            "unit": record.unit,
+            "notes": record.notes,
+            # UTC, normalized by HealthRecordCreate
+            "measured_at": record.measured_at
+        })
+    return rows, errors
+
+
+def bulk_insert_rows(db: Session, user_id: int, rows: List[dict], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """
+    Insert rows with executemany, one transaction per chunk
+    Rollups and the data version are updated in the same transaction
+    as each chunk.
+    Returns the number of rows inserted.
+    """
+    inserted = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        insert_record_rows(db, chunk)
+        update_rollups_from_rows(db, user_id, chunk)
+        bump_data_version(db, user_id)
+        db.commit()
+        inserted += len(chunk)
+    return inserted
+
+
+# Column order of exported records
+EXPORT_COLUMNS = ["id", "measurement_type", "value", "unit", "notes", "measured_at", "created_at"]
+
+
+def _export_value(value):
+    """Datetimes as ISO 8601, everything else as-is"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_COLUMNS)
+    return buffer.getvalue()
+
+
+def export_csv_chunk(rows) -> str:
+    """Serialize a chunk of export rows as CSV lines"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else _export_value(value) for value in row])
+    return buffer.getvalue()
+
+
+def export_ndjson_chunk(rows) -> str:
+    """Serialize a chunk of export rows as NDJSON lines"""
+    return "".join(
+        json.dumps({column: _export_value(value) for column, value in zip(EXPORT_COLUMNS, row)}) + "\n"
+        for row in rows
+    )
+
+
+# Response fast path: HealthRecordResponse fields, in declaration order
+RESPONSE_COLUMNS = [
+    HealthRecord.id,
+    HealthRecord.measurement_type,
+    HealthRecord.value,
+    HealthRecord.unit,
+    HealthRecord.notes,
+    HealthRecord.measured_at,
+    HealthRecord.created_at,
+]
+
+
+def response_columns(table: Table) -> list:
+    """RESPONSE_COLUMNS of one partition table"""
+    return [table.c[column.key] for column in RESPONSE_COLUMNS]
+
+
+# Same settings FastAPI's JSONResponse renders with
+_RESPONSE_ENCODER = json.JSONEncoder(
+    ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+)
+
+
+def _json_datetime(value: datetime) -> str:
+    """ISO 8601 as pydantic writes it, with Z for UTC"""
+    text = value.isoformat()
+    if text.endswith("+00:00"):
+        return text[:-6] + "Z"
+    return text
+
+
+def serialize_record_rows(rows) -> bytes:
+    """
+    Encode RESPONSE_COLUMNS rows as a List[HealthRecordResponse] JSON body
+    Byte-identical to the response_model path, but skips per-row model
+    validation and jsonable_encoder
+    """
+    payload = [
+        {
+            "id": id,
+            "measurement_type": measurement_type,
+            "value": float(value),
+            "unit": unit,
+            "notes": notes,
+            "measured_at": _json_datetime(measured_at),
+            "created_at": _json_datetime(created_at),
+        }
+        for id, measurement_type, value, unit, notes, measured_at, created_at in rows
+    ]
+    return _RESPONSE_ENCODER.encode(payload).encode("utf-8")
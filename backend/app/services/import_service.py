@@ -0,0 +1,292 @@
+"""
+Chunked, resumable imports of third-party health data files
+
+Uploads are spooled to disk, then parsed as a stream and inserted in
+bounded chunks. Each chunk's records, rollups and the job's progress
+commit together, so an interrupted import resumes from the byte offset
+after its last committed chunk without duplicating rows.
+
+A job is processed only by the runner that claimed it: new jobs are
+created running, and a resume flips a resumable job to running with a
+conditional UPDATE. Each chunk commits only if the job is still running
+at the offset the runner started the chunk from, so a stale runner that
+lost its claim rolls back instead of inserting rows twice.
+"""
+
+import csv
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.import_job import ImportJob
+from ..schemas.health import FileFormat, MeasurementType
+from .health_service import validate_bulk_items
+from .partition_service import insert_record_rows
+from .rollup_service import update_rollups_from_rows
+from .version_service import bump_data_version
+
+# Source column names recognised for each record field, in priority order
+DEFAULT_COLUMNS = {
+    "measurement_type": ["measurement_type", "type", "metric", "data_type"],
+    "value": ["value", "qty", "quantity", "amount"],
+    "unit": ["unit", "units"],
+    "measured_at": ["measured_at", "timestamp", "start_date", "startdate", "date", "time"],
+    "notes": ["notes", "note", "comment"],
+}
+
+# Common third-party names for our measurement types
+TYPE_ALIASES = {
+    "heartrate": MeasurementType.HEART_RATE,
+    "hr": MeasurementType.HEART_RATE,
+    "pulse": MeasurementType.HEART_RATE,
+    "step_count": MeasurementType.STEPS,
+    "stepcount": MeasurementType.STEPS,
+    "body_mass": MeasurementType.WEIGHT,
+    "bodymass": MeasurementType.WEIGHT,
+    "body_fat_percentage": MeasurementType.BODY_FAT,
+    "active_energy_burned": MeasurementType.CALORIES_BURNED,
+    "active_calories": MeasurementType.CALORIES_BURNED,
+    "exercise_time": MeasurementType.EXERCISE_MINUTES,
+    "sleep": MeasurementType.SLEEP_HOURS,
+    "sleep_duration": MeasurementType.SLEEP_HOURS,
+    "systolic": MeasurementType.BLOOD_PRESSURE_SYSTOLIC,
+    "diastolic": MeasurementType.BLOOD_PRESSURE_DIASTOLIC,
+    "glucose": MeasurementType.BLOOD_GLUCOSE,
+    "temperature": MeasurementType.BODY_TEMPERATURE,
+    "mood": MeasurementType.MOOD_RATING,
+    "stress": MeasurementType.STRESS_LEVEL,
+}
+
+# Unit used when a file doesn't give one
+DEFAULT_UNITS = {
+    MeasurementType.WEIGHT: "kg",
+    MeasurementType.HEIGHT: "cm",
+    MeasurementType.BODY_FAT: "percent",
+    MeasurementType.HEART_RATE: "bpm",
+    MeasurementType.BLOOD_PRESSURE_SYSTOLIC: "mmHg",
+    MeasurementType.BLOOD_PRESSURE_DIASTOLIC: "mmHg",
+    MeasurementType.BODY_TEMPERATURE: "celsius",
+    MeasurementType.STEPS: "steps",
+    MeasurementType.CALORIES_BURNED: "kcal",
+    MeasurementType.EXERCISE_MINUTES: "minutes",
+    MeasurementType.SLEEP_HOURS: "hours",
+    MeasurementType.MOOD_RATING: "scale",
+    MeasurementType.STRESS_LEVEL: "scale",
+    MeasurementType.BLOOD_GLUCOSE: "mg/dL",
+}
+
+_VALID_TYPES = {mt.value: mt for mt in MeasurementType}
+
+
+def normalize_measurement_type(raw) -> Optional[MeasurementType]:
+    """Map a source type name onto MeasurementType, or None if unknown"""
+    if raw is None:
+        return None
+    key = str(raw).strip().lower().replace(" ", "_").replace("-", "_")
+    return _VALID_TYPES.get(key) or TYPE_ALIASES.get(key)
+
+
+def resolve_columns(header: List[str], column_map: Dict[str, str]) -> Dict[str, str]:
+    """
+    Decide which source column feeds each record field
+    Explicit column_map entries win over the DEFAULT_COLUMNS guesses.
+    Raises ValueError if no value or type column can be found.
+    """
+    by_lower = {column.strip().lower(): column for column in header}
+    columns = {}
+    for field, candidates in DEFAULT_COLUMNS.items():
+        if field in column_map:
+            columns[field] = column_map[field]
+            continue
+        for candidate in candidates:
+            if candidate in by_lower:
+                columns[field] = by_lower[candidate]
+                break
+
+    missing = [field for field in ("measurement_type", "value") if field not in columns]
+    if missing:
+        raise ValueError(f"No column found for: {', '.join(missing)}")
+    return columns
+
+
+def map_record(raw: dict, columns: Dict[str, str]) -> dict:
+    """Translate one source record into HealthRecordCreate fields"""
+    raw_type = raw.get(columns["measurement_type"])
+    measurement_type = normalize_measurement_type(raw_type)
+
+    item = {
+        # Unknown types pass through so validation reports them
+        "measurement_type": measurement_type.value if measurement_type else raw_type,
+        "value": raw.get(columns["value"]),
+    }
+
+    unit = raw.get(columns["unit"]) if "unit" in columns else None
+    if not unit and measurement_type is not None:
+        unit = DEFAULT_UNITS[measurement_type]
+    item["unit"] = unit
+
+    if "notes" in columns and raw.get(columns["notes"]):
+        item["notes"] = raw[columns["notes"]]
+
+    measured_at = raw.get(columns["measured_at"]) if "measured_at" in columns else None
+    if measured_at not in (None, ""):
+        item["measured_at"] = measured_at
+
+    return item
+
+
+class _LineReader:
+    """Iterates a binary file's lines as text, tracking the byte position"""
+
+    def __init__(self, file, position: int):
+        self.file = file
+        self.position = position
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.file.readline()
+        if not line:
+            raise StopIteration
+        self.position += len(line)
+        return line.decode("utf-8")
+
+
+def iter_chunks(path: str, file_format: str, column_map: Dict[str, str],
+                offset: int, chunk_size: int) -> Iterator[Tuple[List[dict], int]]:
+    """
+    Stream an import file from `offset` in chunks of up to chunk_size items
+    Yields (items, end_offset), where end_offset is where the next chunk
+    starts. Only one chunk is held in memory at a time.
+    """
+    with open(path, "rb") as file:
+        if file_format == FileFormat.CSV.value:
+            # The header is always re-read so a resumed job can map rows
+            header_line = file.readline()
+            header = next(csv.reader([header_line.decode("utf-8-sig")]))
+            columns = resolve_columns(header, column_map)
+            offset = max(offset, len(header_line))
+            file.seek(offset)
+            lines = _LineReader(file, offset)
+            records = (dict(zip(header, row)) for row in csv.reader(lines) if row)
+            mapped = (map_record(record, columns) for record in records)
+        else:
+            file.seek(offset)
+            lines = _LineReader(file, offset)
+            mapped = (_parse_ndjson_line(line, column_map) for line in lines if line.strip())
+
+        chunk = []
+        for item in mapped:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield chunk, lines.position
+                chunk = []
+        if chunk:
+            yield chunk, lines.position
+
+
+def _parse_ndjson_line(line: str, column_map: Dict[str, str]):
+    """Parse and map one NDJSON line; None (reported as invalid) if unreadable"""
+    try:
+        raw = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(raw, dict):
+        return None
+    try:
+        return map_record(raw, resolve_columns(list(raw), column_map))
+    except ValueError:
+        return None
+
+
+class ImportClaimLost(Exception):
+    """Another runner has taken over, or finished, the job"""
+
+
+def claim_import(db: Session, job_id: int) -> bool:
+    """
+    Atomically mark a failed or stalled job as running
+    Returns False if the job isn't resumable, e.g. because a concurrent
+    resume claimed it first
+    """
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.IMPORT_STALE_SECONDS)
+    result = db.execute(
+        update(ImportJob)
+        .where(
+            ImportJob.id == job_id,
+            or_(
+                ImportJob.status == "failed",
+                and_(ImportJob.status.in_(("pending", "running")), ImportJob.updated_at < stale_before)
+            )
+        )
+        .values(status="running", error=None, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def _update_claimed(db: Session, job_id: int, offset: int, **values) -> bool:
+    """Update the job only while it is running at the offset this runner last committed"""
+    result = db.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id, ImportJob.status == "running", ImportJob.committed_offset == offset)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def run_import(session_factory, job_id: int, chunk_size: Optional[int] = None) -> None:
+    """
+    Process a claimed (running) import job from its last committed offset
+    Runs as a background task with its own session
+    """
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    db: Session = session_factory()
+    offset = None
+    try:
+        job = db.get(ImportJob, job_id)
+        if job is None or job.status != "running":
+            return
+        user_id, file_path, offset = job.user_id, job.file_path, job.committed_offset
+
+        column_map = json.loads(job.column_map) if job.column_map else {}
+        chunks = iter_chunks(file_path, job.file_format, column_map, offset, chunk_size)
+        for items, end_offset in chunks:
+            rows, errors = validate_bulk_items(user_id, items)
+            if rows:
+                insert_record_rows(db, rows)
+                update_rollups_from_rows(db, user_id, rows)
+                bump_data_version(db, user_id)
+
+            # Records, rollups, data version and progress commit together
+            if not _update_claimed(
+                db, job_id, offset, committed_offset=end_offset,
+                rows_inserted=ImportJob.rows_inserted + len(rows),
+                rows_failed=ImportJob.rows_failed + len(errors)
+            ):
+                raise ImportClaimLost()
+            db.commit()
+            offset = end_offset
+
+        if _update_claimed(db, job_id, offset, status="completed"):
+            db.commit()
+            os.remove(file_path)
+
+    except ImportClaimLost:
+        db.rollback()
+
+    except Exception as e:
+        db.rollback()
+        if offset is not None and _update_claimed(db, job_id, offset, status="failed", error=str(e)):
+            db.commit()
+
+    finally:
+        db.close()
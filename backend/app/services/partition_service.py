@@ -0,0 +1,268 @@
+"""
+Time-partitioned storage for health records
+
+With RECORD_PARTITIONING enabled, records live in one table per calendar
+month (health_records_YYYY_MM) instead of health_records. This module is
+the routing layer the record access paths go through:
+
+  * record_tables picks the tables a date range can touch, so range
+    queries only scan the months they cover
+  * insert_record_rows sends each row to its month's table, creating
+    the table on first use
+  * drop_partitions_before removes whole months with DROP TABLE rather
+    than a DELETE over one large B-tree
+
+Ids come from a shared counter so they stay unique across partitions.
+With partitioning disabled every helper routes to health_records.
+
+Run `python -m app.services.partition_service migrate` to move existing
+health_records rows into partitions before enabling the setting, and
+`python -m app.services.partition_service drop-before YYYY-MM` to drop
+every month before the given one.
+"""
+
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Index, Row, Table, case, delete, func, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.database import Base, upsert_insert
+from ..models.health_record import HealthRecord
+from ..models.record_partition import HealthRecordPartition, RecordIdSequence
+from .version_service import bump_data_version
+
+PARTITION_PREFIX = "health_records_"
+SEQUENCE_NAME = "health_records"
+# Rows moved per transaction by migrate_to_partitions
+MIGRATE_BATCH_SIZE = 10_000
+
+_tables_lock = threading.Lock()
+
+
+def partitioning_enabled() -> bool:
+    return settings.RECORD_PARTITIONING
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the value's month, as a naive UTC datetime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return datetime(value.year, value.month, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y_%m}"
+
+
+def partition_table(name: str) -> Table:
+    """
+    Table object for one partition, same columns and indexes as health_records
+    Defined on Base.metadata once per process; creating it in the
+    database is ensure_partitions' job
+    """
+    with _tables_lock:
+        table = Base.metadata.tables.get(name)
+        if table is not None:
+            return table
+        return Table(
+            name,
+            Base.metadata,
+            *[column._copy() for column in HealthRecord.__table__.columns],
+            Index(f"ix_{name}_user_type_measured", "user_id", "measurement_type", "measured_at"),
+            Index(f"ix_{name}_user_measured", "user_id", "measured_at", "id"),
+        )
+
+
+def record_tables(db: Session, start_date: Optional[datetime] = None,
+                  end_date: Optional[datetime] = None, newest_first: bool = False) -> List[Table]:
+    """
+    Tables holding records measured between start_date and end_date
+    Ordered by month, oldest first unless newest_first. The range is
+    widened by a day each side so a timestamp stored with a non-UTC
+    offset still routes to every month it could compare into; the
+    callers' own date filters keep results exact.
+    """
+    if not partitioning_enabled():
+        return [HealthRecord.__table__]
+
+    registry = HealthRecordPartition.__table__
+    query = select(registry.c.table_name)
+    if start_date is not None:
+        query = query.where(registry.c.month_start >= month_start(start_date - timedelta(days=1)))
+    if end_date is not None:
+        query = query.where(registry.c.month_start <= month_start(end_date + timedelta(days=1)))
+    order = registry.c.month_start.desc() if newest_first else registry.c.month_start
+    return [partition_table(name) for name in db.scalars(query.order_by(order))]
+
+
+def ensure_partitions(db: Session, months: Iterable[datetime]) -> None:
+    """Create and register the partitions for months that don't have one yet"""
+    months = set(months)
+    registry = HealthRecordPartition.__table__
+    existing = set(db.scalars(
+        select(registry.c.month_start).where(registry.c.month_start.in_(months))
+    ))
+
+    for month in sorted(months - existing):
+        name = partition_name(month)
+        partition_table(name).create(db.connection(), checkfirst=True)
+        # Another worker may have registered it meanwhile
+        db.execute(
+            upsert_insert(db)(registry)
+            .values(table_name=name, month_start=month)
+            .on_conflict_do_nothing()
+        )
+
+
+def allocate_ids(db: Session, count: int) -> int:
+    """
+    Reserve `count` consecutive record ids; returns the first
+    The counter starts after any ids left in health_records
+    """
+    sequence = RecordIdSequence.__table__
+    next_id = db.execute(
+        sequence.update()
+        .where(sequence.c.name == SEQUENCE_NAME)
+        .values(next_id=sequence.c.next_id + count)
+        .returning(sequence.c.next_id)
+    ).scalar()
+
+    if next_id is None:
+        start = (db.scalar(select(func.max(HealthRecord.id))) or 0) + 1
+        stmt = upsert_insert(db)(sequence).values(name=SEQUENCE_NAME, next_id=start + count)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[sequence.c.name],
+            set_={"next_id": sequence.c.next_id + count}
+        ).returning(sequence.c.next_id)
+        next_id = db.execute(stmt).scalar_one()
+
+    return next_id - count
+
+
+def insert_record_rows(db: Session, rows: List[dict], returning: bool = False) -> List[Row]:
+    """
+    Insert record rows into the table(s) they route to
+    With returning, the inserted rows (id and created_at included) come
+    back ordered by id, i.e. the order they were given in
+    """
+    if not rows:
+        return []
+
+    if not partitioning_enabled():
+        tables = {HealthRecord.__table__: rows}
+    else:
+        first_id = allocate_ids(db, len(rows))
+        by_month: Dict[datetime, List[dict]] = {}
+        for offset, row in enumerate(rows):
+            month = month_start(row["measured_at"])
+            by_month.setdefault(month, []).append({**row, "id": first_id + offset})
+        ensure_partitions(db, by_month)
+        tables = {partition_table(partition_name(month)): month_rows
+                  for month, month_rows in by_month.items()}
+
+    inserted = []
+    for table, table_rows in tables.items():
+        if returning:
+            # RETURNING order is unspecified, but ids are assigned in VALUES
+            # order; sort_by_parameter_order would split this into one INSERT
+            # per row on SQLite
+            inserted.extend(db.execute(table.insert().returning(*table.c), table_rows).all())
+        else:
+            db.execute(table.insert(), table_rows)
+    return sorted(inserted, key=lambda row: row.id)
+
+
+def drop_partitions_before(db: Session, before: datetime) -> List[str]:
+    """
+    Drop every partition for months before `before`'s month
+    Rollups of the affected users are rebuilt and their data versions
+    bumped. Returns the dropped table names.
+    """
+    from .rollup_service import rebuild_rollups
+
+    registry = HealthRecordPartition.__table__
+    names = list(db.scalars(
+        select(registry.c.table_name).where(registry.c.month_start < month_start(before))
+    ))
+
+    user_ids = set()
+    for name in names:
+        table = partition_table(name)
+        user_ids.update(db.scalars(select(table.c.user_id).distinct()))
+        table.drop(db.connection(), checkfirst=True)
+        db.execute(delete(registry).where(registry.c.table_name == name))
+    db.commit()
+
+    for user_id in sorted(user_ids):
+        rebuild_rollups(db, user_id)
+        bump_data_version(db, user_id)
+    db.commit()
+    return names
+
+
+def migrate_to_partitions(db: Session, batch_size: int = MIGRATE_BATCH_SIZE) -> int:
+    """
+    Move health_records rows into monthly partitions, keeping their ids
+    Runs in batches, one transaction each, so it can be interrupted and
+    rerun. Returns the number of rows moved.
+    """
+    base = HealthRecord.__table__
+    sequence = RecordIdSequence.__table__
+
+    # Partitioned inserts continue after the migrated ids
+    after_last = (db.scalar(select(func.max(base.c.id))) or 0) + 1
+    stmt = upsert_insert(db)(sequence).values(name=SEQUENCE_NAME, next_id=after_last)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[sequence.c.name],
+        set_={"next_id": case(
+            (sequence.c.next_id < after_last, after_last),
+            else_=sequence.c.next_id
+        )}
+    ))
+    db.commit()
+
+    moved = 0
+    while True:
+        rows = db.execute(select(base).order_by(base.c.id).limit(batch_size)).mappings().all()
+        if not rows:
+            break
+
+        by_month: Dict[datetime, List[dict]] = {}
+        for row in rows:
+            by_month.setdefault(month_start(row["measured_at"]), []).append(dict(row))
+        ensure_partitions(db, by_month)
+        for month, month_rows in by_month.items():
+            db.execute(partition_table(partition_name(month)).insert(), month_rows)
+
+        db.execute(delete(base).where(base.c.id <= rows[-1]["id"]))
+        db.commit()
+        moved += len(rows)
+
+    return moved
+
+
+if __name__ == "__main__":
+    from ..core.database import SessionLocal, create_schema
+
+    parser = argparse.ArgumentParser(description="Manage monthly health record partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Move health_records rows into partitions")
+    drop = commands.add_parser("drop-before", help="Drop partitions for months before MONTH")
+    drop.add_argument("month", help="YYYY-MM")
+    args = parser.parse_args()
+
+    create_schema()
+
+    db = SessionLocal()
+    try:
+        if args.command == "migrate":
+            print(f"Moved {migrate_to_partitions(db)} records into partitions")
+        else:
+            dropped = drop_partitions_before(db, datetime.strptime(args.month, "%Y-%m"))
+            print(f"Dropped {len(dropped)} partitions: {', '.join(dropped) or '-'}")
+    finally:
+        db.close()
@@ -0,0 +1,248 @@
+"""
+Retention and downsampling of high-frequency health records
+
+Per RETENTION_POLICIES, raw samples older than raw_days are rolled into
+hourly aggregates, and hourly aggregates older than hourly_days into
+daily ones. Each batch deletes its rows with DELETE ... RETURNING,
+folds the returned rows into their buckets and upserts the aggregates
+in one transaction. The job can stop at any point and pick up where it
+left off. Because the delete claims the rows, concurrent runs (several
+workers, or cron alongside the in-process loop) never fold a row twice.
+
+Aggregates keep count, sum, sum of squares, min and max, so rollups
+and series over compacted data are unchanged; listings and analytics
+only cover the raw samples still retained.
+
+Run `python -m app.services.retention_service` from cron, or set
+RETENTION_INTERVAL_SECONDS to run it inside the API process.
+"""
+
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, delete, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.database import upsert_insert
+from ..models.health_aggregate import HealthRecordAggregate
+from ..models.health_rollup import HealthRecordRollup
+from ..schemas.health import MeasurementType
+from .partition_service import record_tables
+from .version_service import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+HOUR = "hour"
+DAY = "day"
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """How long one measurement type is kept at each resolution"""
+    raw_days: int
+    hourly_days: int
+
+
+def load_policies(config: Optional[Dict[str, Dict[str, int]]] = None) -> Dict[str, RetentionPolicy]:
+    """
+    Parse RETENTION_POLICIES (or the given config) by measurement type
+    Raises ValueError for unknown types or raw_days > hourly_days
+    """
+    config = settings.RETENTION_POLICIES if config is None else config
+    valid = {mt.value for mt in MeasurementType}
+    policies = {}
+    for measurement_type, options in config.items():
+        if measurement_type not in valid:
+            raise ValueError(f"Unknown measurement type in retention policy: {measurement_type}")
+        policy = RetentionPolicy(raw_days=options["raw_days"], hourly_days=options["hourly_days"])
+        if policy.raw_days > policy.hourly_days:
+            raise ValueError(f"{measurement_type}: raw_days must not exceed hourly_days")
+        policies[measurement_type] = policy
+    return policies
+
+
+def truncate(value: datetime, resolution: str) -> datetime:
+    """Start of the hour or day containing value"""
+    if resolution == HOUR:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _fold(buckets: dict, user_id: int, measurement_type: str, resolution: str, bucket_start: datetime,
+          unit: str, count: int, value_sum: float, value_sum_sq: float, value_min: float, value_max: float) -> None:
+    """Add statistics to the bucket they fall in"""
+    key = (user_id, bucket_start)
+    bucket = buckets.get(key)
+    if bucket is None:
+        buckets[key] = {
+            "user_id": user_id,
+            "measurement_type": measurement_type,
+            "resolution": resolution,
+            "bucket_start": bucket_start,
+            "unit": unit,
+            "sample_count": count,
+            "value_sum": value_sum,
+            "value_sum_sq": value_sum_sq,
+            "value_min": value_min,
+            "value_max": value_max
+        }
+        return
+
+    bucket["sample_count"] += count
+    bucket["value_sum"] += value_sum
+    bucket["value_sum_sq"] += value_sum_sq
+    bucket["value_min"] = min(bucket["value_min"], value_min)
+    bucket["value_max"] = max(bucket["value_max"], value_max)
+
+
+def _upsert_aggregates(db: Session, buckets: Iterable[dict]) -> None:
+    """Merge bucket statistics into existing aggregate rows"""
+    table = HealthRecordAggregate.__table__
+    stmt = upsert_insert(db)(table).values(list(buckets))
+    new = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.measurement_type, table.c.resolution, table.c.bucket_start],
+        set_={
+            "sample_count": table.c.sample_count + new.sample_count,
+            "value_sum": table.c.value_sum + new.value_sum,
+            "value_sum_sq": table.c.value_sum_sq + new.value_sum_sq,
+            "value_min": case((new.value_min < table.c.value_min, new.value_min), else_=table.c.value_min),
+            "value_max": case((new.value_max > table.c.value_max, new.value_max), else_=table.c.value_max)
+        }
+    )
+    db.execute(stmt)
+
+
+def compact_raw(db: Session, user_id: int, measurement_type: str, cutoff: datetime, batch_size: int) -> int:
+    """
+    Roll one user's raw samples measured before cutoff into hourly aggregates
+    Returns the number of raw rows compacted
+    """
+    compacted = 0
+    for table in record_tables(db, end_date=cutoff):
+        records = table.c
+        while True:
+            # Deleting first claims the batch; a concurrent run's delete
+            # then finds these rows gone. The inner select is served by
+            # the (user_id, measurement_type, measured_at) index
+            batch = select(records.id).where(
+                records.user_id == user_id,
+                records.measurement_type == measurement_type,
+                records.measured_at < cutoff
+            ).order_by(records.measured_at).limit(batch_size)
+            rows = db.execute(delete(table).where(records.id.in_(batch)).returning(
+                records.id, records.value, records.unit, records.measured_at
+            )).all()
+            if not rows:
+                # End the empty delete's transaction, releasing its lock
+                db.commit()
+                break
+
+            buckets = {}
+            for row in rows:
+                _fold(buckets, user_id, measurement_type, HOUR, truncate(row.measured_at, HOUR),
+                      row.unit, 1, row.value, row.value * row.value, row.value, row.value)
+
+            # Aggregates and deletes commit together
+            _upsert_aggregates(db, buckets.values())
+            bump_data_version(db, user_id)
+            db.commit()
+            compacted += len(rows)
+    return compacted
+
+
+def compact_hourly(db: Session, user_id: int, measurement_type: str, cutoff: datetime, batch_size: int) -> int:
+    """
+    Roll one user's hourly aggregates starting before cutoff into daily ones
+    Returns the number of hourly rows compacted
+    """
+    table = HealthRecordAggregate.__table__
+    hours = (
+        table.c.user_id == user_id,
+        table.c.measurement_type == measurement_type,
+        table.c.resolution == HOUR
+    )
+    compacted = 0
+    while True:
+        # Claimed by deleting, as in compact_raw
+        batch = select(table.c.bucket_start).where(
+            *hours, table.c.bucket_start < cutoff
+        ).order_by(table.c.bucket_start).limit(batch_size)
+        rows = db.execute(
+            delete(table).where(*hours, table.c.bucket_start.in_(batch)).returning(*table.c)
+        ).all()
+        if not rows:
+            db.commit()
+            break
+
+        buckets = {}
+        for row in rows:
+            _fold(buckets, user_id, measurement_type, DAY, truncate(row.bucket_start, DAY), row.unit,
+                  row.sample_count, row.value_sum, row.value_sum_sq, row.value_min, row.value_max)
+
+        _upsert_aggregates(db, buckets.values())
+        bump_data_version(db, user_id)
+        db.commit()
+        compacted += len(rows)
+    return compacted
+
+
+def compact(db: Session, now: Optional[datetime] = None, batch_size: Optional[int] = None,
+            policies: Optional[Dict[str, RetentionPolicy]] = None) -> Dict[str, int]:
+    """
+    Apply every retention policy once
+    Returns the number of raw and hourly rows compacted
+    """
+    now = now or datetime.now(timezone.utc)
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    policies = load_policies() if policies is None else policies
+
+    totals = {"raw": 0, "hourly": 0}
+    for measurement_type, policy in policies.items():
+        # Rollups list every (user, type) that has data
+        user_ids = list(db.scalars(
+            select(HealthRecordRollup.user_id).where(HealthRecordRollup.measurement_type == measurement_type)
+        ))
+        raw_cutoff = now - timedelta(days=policy.raw_days)
+        hourly_cutoff = now - timedelta(days=policy.hourly_days)
+        for user_id in user_ids:
+            totals["raw"] += compact_raw(db, user_id, measurement_type, raw_cutoff, batch_size)
+            totals["hourly"] += compact_hourly(db, user_id, measurement_type, hourly_cutoff, batch_size)
+    return totals
+
+
+def run_compaction(session_factory) -> Dict[str, int]:
+    """Run compact() with its own session"""
+    db = session_factory()
+    try:
+        return compact(db)
+    finally:
+        db.close()
+
+
+async def compaction_loop(session_factory, interval: float) -> None:
+    """Run compaction every `interval` seconds until cancelled"""
+    while True:
+        try:
+            totals = await run_in_threadpool(run_compaction, session_factory)
+            logger.info("Retention compaction: %(raw)d raw and %(hourly)d hourly rows", totals)
+        except Exception:
+            logger.exception("Retention compaction failed")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    from ..core.database import SessionLocal, create_schema
+
+    parser = argparse.ArgumentParser(description="Compact health records per the retention policies")
+    parser.parse_args()
+
+    create_schema()
+    totals = run_compaction(SessionLocal)
+    print(f"Compacted {totals['raw']} raw and {totals['hourly']} hourly rows")
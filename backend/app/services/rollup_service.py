@@ -0,0 +1,209 @@
+"""
+Maintenance of the per-user health record rollups
+
+Run `python -m app.services.rollup_service [--user-id ID]` to rebuild
+rollups from the stored records after manual data fixes, and once after
+upgrading a database that already holds records.
+"""
+
+import argparse
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from ..core.database import upsert_insert
+from ..models.health_aggregate import HealthRecordAggregate
+from ..models.health_rollup import HealthRecordRollup
+from .partition_service import record_tables
+
+
+def _fold(deltas: dict, user_id: int, measurement_type: str, value: float, measured_at) -> None:
+    """Add one measurement to the per-type deltas of a write"""
+    delta = deltas.get(measurement_type)
+    if delta is None:
+        deltas[measurement_type] = {
+            "user_id": user_id,
+            "measurement_type": measurement_type,
+            "record_count": 1,
+            "value_sum": value,
+            "value_sum_sq": value * value,
+            "first_measured_at": measured_at,
+            "last_measured_at": measured_at,
+            "last_value": value
+        }
+        return
+
+    delta["record_count"] += 1
+    delta["value_sum"] += value
+    delta["value_sum_sq"] += value * value
+    if measured_at < delta["first_measured_at"]:
+        delta["first_measured_at"] = measured_at
+    if measured_at >= delta["last_measured_at"]:
+        delta["last_measured_at"] = measured_at
+        delta["last_value"] = value
+
+
+def update_rollups(db: Session, user_id: int, records: Iterable) -> None:
+    """
+    Fold newly added records into the user's rollups
+    Issues one upsert statement; the caller commits it together
+    with the records so both land in the same transaction
+    """
+    deltas = {}
+    for record in records:
+        _fold(deltas, user_id, record.measurement_type, record.value, record.measured_at)
+    _upsert_deltas(db, deltas)
+
+
+def update_rollups_from_rows(db: Session, user_id: int, rows: Iterable[dict]) -> None:
+    """Same as update_rollups for plain row dicts used by bulk inserts"""
+    deltas = {}
+    for row in rows:
+        _fold(deltas, user_id, row["measurement_type"], row["value"], row["measured_at"])
+    _upsert_deltas(db, deltas)
+
+
+def _upsert_deltas(db: Session, deltas: dict) -> None:
+    """Merge per-type deltas into existing rollup rows"""
+    if not deltas:
+        return
+
+    table = HealthRecordRollup.__table__
+    stmt = upsert_insert(db)(table).values(list(deltas.values()))
+    new = stmt.excluded
+    is_newer = new.last_measured_at >= table.c.last_measured_at
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.measurement_type],
+        set_={
+            "record_count": table.c.record_count + new.record_count,
+            "value_sum": table.c.value_sum + new.value_sum,
+            "value_sum_sq": table.c.value_sum_sq + new.value_sum_sq,
+            "first_measured_at": case(
+                (new.first_measured_at < table.c.first_measured_at, new.first_measured_at),
+                else_=table.c.first_measured_at
+            ),
+            "last_measured_at": case(
+                (is_newer, new.last_measured_at),
+                else_=table.c.last_measured_at
+            ),
+            "last_value": case(
+                (is_newer, new.last_value),
+                else_=table.c.last_value
+            )
+        }
+    )
+    db.execute(stmt)
+
+
+def _merge_aggregate(merged: dict, row) -> None:
+    """Fold one partition's aggregate row into the per-(user, type) totals"""
+    user_id, measurement_type, count, value_sum, value_sum_sq, first, last, last_value = row
+    total = merged.get((user_id, measurement_type))
+    if total is None:
+        merged[(user_id, measurement_type)] = {
+            "user_id": user_id,
+            "measurement_type": measurement_type,
+            "record_count": count,
+            "value_sum": value_sum,
+            "value_sum_sq": value_sum_sq,
+            "first_measured_at": first,
+            "last_measured_at": last,
+            "last_value": last_value
+        }
+        return
+
+    total["record_count"] += count
+    total["value_sum"] += value_sum
+    total["value_sum_sq"] += value_sum_sq
+    if first < total["first_measured_at"]:
+        total["first_measured_at"] = first
+    if last > total["last_measured_at"]:
+        total["last_measured_at"] = last
+        total["last_value"] = last_value
+
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None) -> None:
+    """
+    Recompute rollups from the stored records
+    Rebuilds every user when user_id is None. Each record partition and
+    the compacted aggregates are summarized in SQL and the results merged.
+    """
+    delete = db.query(HealthRecordRollup)
+    if user_id is not None:
+        delete = delete.filter(HealthRecordRollup.user_id == user_id)
+    delete.delete(synchronize_session=False)
+
+    merged = {}
+    for table in record_tables(db):
+        records = table.c
+
+        # Value of the newest record per (user, type)
+        latest = table.alias()
+        last_value = select(latest.c.value).where(
+            latest.c.user_id == records.user_id,
+            latest.c.measurement_type == records.measurement_type
+        ).order_by(
+            latest.c.measured_at.desc(), latest.c.id.desc()
+        ).limit(1).scalar_subquery()
+
+        aggregates = select(
+            records.user_id,
+            records.measurement_type,
+            func.count(records.id),
+            func.sum(records.value),
+            func.sum(records.value * records.value),
+            func.min(records.measured_at),
+            func.max(records.measured_at),
+            last_value
+        ).group_by(records.user_id, records.measurement_type)
+        if user_id is not None:
+            aggregates = aggregates.where(records.user_id == user_id)
+
+        for row in db.execute(aggregates):
+            _merge_aggregate(merged, row)
+
+    # Samples the retention job compacted into hourly/daily aggregates
+    compacted = HealthRecordAggregate.__table__
+    latest = compacted.alias()
+    last_value = select(latest.c.value_sum / latest.c.sample_count).where(
+        latest.c.user_id == compacted.c.user_id,
+        latest.c.measurement_type == compacted.c.measurement_type
+    ).order_by(latest.c.bucket_start.desc()).limit(1).scalar_subquery()
+
+    aggregates = select(
+        compacted.c.user_id,
+        compacted.c.measurement_type,
+        func.sum(compacted.c.sample_count),
+        func.sum(compacted.c.value_sum),
+        func.sum(compacted.c.value_sum_sq),
+        func.min(compacted.c.bucket_start),
+        func.max(compacted.c.bucket_start),
+        last_value
+    ).group_by(compacted.c.user_id, compacted.c.measurement_type)
+    if user_id is not None:
+        aggregates = aggregates.where(compacted.c.user_id == user_id)
+
+    for row in db.execute(aggregates):
+        _merge_aggregate(merged, row)
+
+    if merged:
+        db.execute(HealthRecordRollup.__table__.insert(), list(merged.values()))
+    db.commit()
+
+
+if __name__ == "__main__":
+    from ..core.database import SessionLocal, create_schema
+
+    parser = argparse.ArgumentParser(description="Rebuild health record rollups")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user")
+    args = parser.parse_args()
+
+    # Databases created before rollups existed need the table first
+    create_schema()
+
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db, args.user_id)
+    finally:
+        db.close()
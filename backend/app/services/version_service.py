@@ -0,0 +1,60 @@
+"""
+Per-user data versions and the ETags derived from them
+
+Every write to a user's health data bumps their version in the same
+transaction, so a read endpoint can tell whether anything changed with
+one primary-key lookup instead of querying the records.
+"""
+
+import hashlib
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.database import upsert_insert
+from ..models.data_version import UserDataVersion
+
+
+def bump_data_version(db: Session, user_id: int) -> None:
+    """
+    Increment the user's data version
+    The caller commits it together with the write it records
+    """
+    insert = upsert_insert(db)
+    stmt = insert(UserDataVersion).values(user_id=user_id, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserDataVersion.user_id],
+        set_={"version": UserDataVersion.version + 1}
+    )
+    db.execute(stmt)
+
+
+def get_data_version(db: Session, user_id: int) -> int:
+    """Current data version; 0 for users who never wrote anything"""
+    version = db.scalar(
+        select(UserDataVersion.version).where(UserDataVersion.user_id == user_id)
+    )
+    return version or 0
+
+
+def make_etag(user_id: int, version: int, path: str, params: Iterable[Tuple[str, str]]) -> str:
+    """
+    Weak ETag for one view of a user's data
+    Parameters are sorted so their order in the URL doesn't matter
+    """
+    key = "|".join([str(user_id), str(version), path] + [f"{k}={v}" for k, v in sorted(params)])
+    return f'W/"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check using weak comparison (RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
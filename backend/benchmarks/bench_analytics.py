@@ -0,0 +1,156 @@
+"""
+Benchmark: NumPy analytics engine vs per-object Python analytics
+
+Builds a throwaway SQLite database holding one user's heart-rate series
+and times the same summary computed both ways:
+  * per-object: ORM query of HealthRecord objects, then Python loops
+  * vectorized: analytics_service.load_series + summarize
+
+Usage (from backend/):
+    python -m benchmarks.bench_analytics [--rows 1000000]
+"""
+
+import argparse
+import math
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import User
+from app.models.health_record import HealthRecord
+from app.services import analytics_service
+
+WINDOW = 7
+ALPHA = 0.3
+
+
+def seed(session, rows: int) -> int:
+    """Insert one user with `rows` heart-rate samples a minute apart"""
+    user = User(email="bench@healthsync.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+
+    rng = np.random.default_rng(0)
+    values = rng.normal(70, 8, rows)
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    table = HealthRecord.__table__
+    chunk = 50_000
+    for offset in range(0, rows, chunk):
+        session.execute(table.insert(), [
+            {
+                "user_id": user.id,
+                "measurement_type": "heart_rate",
+                "value": float(values[i]),
+                "unit": "bpm",
+                "measured_at": start + timedelta(minutes=i)
+            }
+            for i in range(offset, min(rows, offset + chunk))
+        ])
+    session.commit()
+    return user.id
+
+
+def per_object_summary(session, user_id: int, today: int) -> dict:
+    """The same analytics computed over ORM objects with Python loops"""
+    records = session.query(HealthRecord).filter(
+        HealthRecord.user_id == user_id,
+        HealthRecord.measurement_type == "heart_rate"
+    ).order_by(HealthRecord.measured_at).all()
+
+    values = [record.value for record in records]
+    n = len(values)
+
+    # Rolling mean of the last WINDOW samples
+    rolling = sum(values[-WINDOW:]) / min(n, WINDOW)
+
+    # EWMA
+    trend = values[0]
+    for value in values[1:]:
+        trend = ALPHA * value + (1 - ALPHA) * trend
+
+    # Percentiles (linear interpolation, as numpy)
+    ordered = sorted(values)
+
+    def pct(q):
+        pos = (n - 1) * q / 100
+        low = math.floor(pos)
+        high = min(low + 1, n - 1)
+        return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+    # Daily means, last delta and streaks
+    daily = {}
+    for record in records:
+        day = record.measured_at.replace(tzinfo=timezone.utc).timestamp() // 86400
+        total, count = daily.get(day, (0.0, 0))
+        daily[day] = (total + record.value, count + 1)
+    days = sorted(daily)
+    means = [daily[day][0] / daily[day][1] for day in days]
+    delta = means[-1] - means[-2] if len(days) > 1 and days[-1] - days[-2] == 1 else None
+
+    longest = current = 1
+    for previous, day in zip(days, days[1:]):
+        current = current + 1 if day - previous == 1 else 1
+        longest = max(longest, current)
+    if days[-1] < today - 1:
+        current = 0
+
+    return {
+        "count": n,
+        "mean": sum(values) / n,
+        "p50": pct(50), "p90": pct(90), "p99": pct(99),
+        "rolling_mean": rolling,
+        "trend": trend,
+        "day_over_day_delta": delta,
+        "longest_streak": longest,
+        "current_streak": current
+    }
+
+
+def vectorized_summary(session, user_id: int, today: int) -> dict:
+    series = analytics_service.load_series(session, user_id, "heart_rate")
+    return analytics_service.summarize(series, WINDOW, ALPHA, today)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+
+        print(f"Seeding {args.rows:,} rows...")
+        user_id = seed(session, args.rows)
+        today = int(time.time() // 86400)
+
+        slow, slow_time = timed(per_object_summary, session, user_id, today)
+        session.expunge_all()
+        fast, fast_time = timed(vectorized_summary, session, user_id, today)
+
+        for key in ("count", "mean", "p50", "p99", "rolling_mean", "trend", "longest_streak"):
+            assert math.isclose(slow[key], fast[key], rel_tol=1e-6), (key, slow[key], fast[key])
+
+        print(f"per-object : {slow_time:8.3f}s")
+        print(f"vectorized : {fast_time:8.3f}s")
+        print(f"speedup    : {slow_time / fast_time:8.1f}x")
+
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
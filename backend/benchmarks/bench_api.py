@@ -0,0 +1,250 @@
+"""
+Benchmark: API endpoint latency and throughput
+
+Seeds a throwaway SQLite database with benchmarks.datagen and drives the
+main endpoints in-process through the ASGI app, `--concurrency` requests
+at a time:
+  * login       POST /auth/login
+  * records     GET /health/records, unfiltered, by type and by date range
+  * summary     GET /health/summary
+  * create      POST /health/records
+  * quick_add   POST /health/quick-add
+
+Requests rotate over the seeded users. Each scenario reports throughput
+and p50/p95/p99 latency, and the results are written as JSON so runs
+on different commits can be compared:
+
+    python -m benchmarks.bench_api --output before.json
+    git checkout <change> && python -m benchmarks.bench_api --baseline before.json
+
+A run against --baseline (or `--compare OLD NEW` on two saved files)
+exits with status 1 if any metric regressed past its threshold; see
+benchmarks.results.
+
+The response cache is disabled unless --response-cache is given, so the
+read scenarios time the query path rather than cache hits.
+
+Usage (from backend/):
+    python -m benchmarks.bench_api [--users 50] [--records 2000] [--requests 500]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.api import health as health_api
+from app.core.database import (
+    Base, get_async_db, get_async_session_factory, get_session_factory, set_sqlite_pragmas, to_async_url
+)
+from app.core.config import settings
+from app.core.deps import user_cache
+from app.core.metrics import instrument_engine
+from app.core.security import create_access_token
+
+from benchmarks import datagen
+from benchmarks.results import document, load, report_regressions, save, summarize
+
+SCENARIOS = ("login", "records", "summary", "create", "quick_add")
+
+class Scenario:
+    """A named request generator; request(i) returns (method, url, kwargs)"""
+
+    def __init__(self, name: str, request: Callable[[int], tuple], expected_status: int = 200):
+        self.name = name
+        self.request = request
+        self.expected_status = expected_status
+
+
+def build_scenarios(user_ids: List[int], tokens: Dict[int, str]) -> Dict[str, Scenario]:
+    """The benchmarked requests, rotating over the seeded users"""
+    users = len(user_ids)
+
+    def auth(i: int) -> dict:
+        return {"Authorization": f"Bearer {tokens[user_ids[i % users]]}"}
+
+    def login(i: int) -> tuple:
+        return "POST", "/api/v1/auth/login", {"json": {
+            "email": datagen.user_email(i % users), "password": datagen.PASSWORD
+        }}
+
+    def records(i: int) -> tuple:
+        params = [
+            {"limit": 50},
+            {"limit": 50, "measurement_types": ["heart_rate", "steps"]},
+            {"limit": 50, "start_date": "2024-03-01T00:00:00", "end_date": "2024-06-01T00:00:00"},
+        ][i % 3]
+        return "GET", "/api/v1/health/records", {"params": params, "headers": auth(i)}
+
+    def summary(i: int) -> tuple:
+        return "GET", "/api/v1/health/summary", {"headers": auth(i)}
+
+    def create(i: int) -> tuple:
+        return "POST", "/api/v1/health/records", {"headers": auth(i), "json": {
+            "measurement_type": "weight", "value": 70 + i % 20, "unit": "kg"
+        }}
+
+    def quick_add(i: int) -> tuple:
+        return "POST", "/api/v1/health/quick-add", {"headers": auth(i), "json": {
+            "weight_kg": 70 + i % 20, "heart_rate_bpm": 60 + i % 30, "steps": 1000 * (i % 12),
+            "sleep_hours": 7.5, "mood_rating": 1 + i % 10
+        }}
+
+    return {
+        "login": Scenario("login", login),
+        "records": Scenario("records", records),
+        "summary": Scenario("summary", summary),
+        "create": Scenario("create", create, expected_status=201),
+        "quick_add": Scenario("quick_add", quick_add, expected_status=201),
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int,
+                       concurrency: int, warmup: int) -> dict:
+    """Send `requests` requests, `concurrency` at a time, after `warmup` untimed ones"""
+    for i in range(warmup):
+        method, url, kwargs = scenario.request(i)
+        await client.request(method, url, **kwargs)
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(warmup, warmup + requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs = scenario.request(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != scenario.expected_status:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def drive(scenarios: List[Scenario], requests: int, concurrency: int, warmup: int) -> Dict[str, dict]:
+    """Run the scenarios in order inside the app's lifespan"""
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in scenarios:
+                results[scenario.name] = await run_scenario(client, scenario, requests, concurrency, warmup)
+    return results
+
+
+def run_suite(database_path: str, users: int, records: int, requests: int, concurrency: int = 1,
+              warmup: int = 10, bcrypt_rounds: int = 12, scenarios=SCENARIOS,
+              response_cache: bool = False) -> Dict[str, dict]:
+    """
+    Seed a database at database_path and benchmark the scenarios against it
+    Returns per-scenario results; the app's dependency overrides and
+    caches are restored afterwards
+    """
+    url = f"sqlite:///{database_path}"
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = session_factory()
+    try:
+        user_ids = datagen.seed(db, users, records, bcrypt_rounds)
+    finally:
+        db.close()
+
+    async_engine = create_async_engine(to_async_url(url))
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    # Same per-statement overhead as the production engine
+    if settings.METRICS_ENABLED:
+        instrument_engine(async_engine.sync_engine)
+    async_session_factory = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def bench_db():
+        async with async_session_factory() as session:
+            yield session
+
+    tokens = {user_id: create_access_token(subject=str(user_id)) for user_id in user_ids}
+    selected = [build_scenarios(user_ids, tokens)[name] for name in scenarios]
+
+    overrides = dict(app.dependency_overrides)
+    cache = health_api.response_cache
+    app.dependency_overrides.update({
+        get_async_db: bench_db,
+        get_async_session_factory: lambda: async_session_factory,
+        get_session_factory: lambda: session_factory,
+    })
+    if not response_cache:
+        health_api.response_cache = None
+    user_cache.clear()
+    try:
+        return asyncio.run(drive(selected, requests, concurrency, warmup))
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(overrides)
+        health_api.response_cache = cache
+        if cache is not None:
+            cache.clear()
+        user_cache.clear()
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+
+
+def print_results(results: Dict[str, dict]) -> None:
+    print(f"{'scenario':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<10} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--records", type=int, default=2000, help="records per user")
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per scenario")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="cost of the seeded password hashes")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--response-cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--output", default="bench_api_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="results JSON to check this run against")
+    parser.add_argument("--thresholds", help='JSON {"default"|scenario: {metric: fraction}}')
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="only compare two saved results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(report_regressions(load(args.compare[0]), load(args.compare[1]), args.thresholds))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Seeding {args.users:,} users x {args.records:,} records...")
+        results = run_suite(
+            os.path.join(tmp, "bench.db"), args.users, args.records, args.requests,
+            concurrency=args.concurrency, warmup=args.warmup, bcrypt_rounds=args.bcrypt_rounds,
+            scenarios=args.scenarios, response_cache=args.response_cache
+        )
+
+    current = document({key: value for key, value in vars(args).items()
+                        if key not in ("output", "baseline", "thresholds", "compare")}, results)
+    print_results(results)
+    save(args.output, current)
+
+    if args.baseline:
+        sys.exit(report_regressions(load(args.baseline), current, args.thresholds))
+
+
+if __name__ == "__main__":
+    main()
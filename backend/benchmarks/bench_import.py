@@ -0,0 +1,160 @@
+"""
+Benchmark: application import, cold start and worker fork
+
+Each run is a fresh interpreter, so nothing is cached between samples:
+  * import      `import app.main`
+  * startup     import, then the app's lifespan startup and shutdown
+  * fork        fork a child from an interpreter that has imported
+                app.main and wait for it to exit, as a preforking
+                server spawns its workers
+
+Every run points DATABASE_URL at a database file that doesn't exist;
+importing must not create it. The slowest modules from one
+`python -X importtime` run are listed too, to show where import time
+goes. Results use the benchmarks.results format:
+
+    python -m benchmarks.bench_import --output before.json
+    git checkout <change> && python -m benchmarks.bench_import --baseline before.json
+
+Usage (from backend/):
+    python -m benchmarks.bench_import [--runs 20]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+from benchmarks.results import document, load, report_regressions, save, summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter; prints the measured seconds as JSON
+IMPORT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({"import": time.perf_counter() - start}))
+"""
+
+STARTUP_SCRIPT = """
+import asyncio, json, time
+start = time.perf_counter()
+import app.main
+
+async def run():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        pass
+
+asyncio.run(run())
+print(json.dumps({"startup": time.perf_counter() - start}))
+"""
+
+FORK_SCRIPT = """
+import json, os, time
+import app.main
+start = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    os._exit(0)
+os.waitpid(pid, 0)
+print(json.dumps({"fork": time.perf_counter() - start}))
+"""
+
+SCENARIOS = {"import": IMPORT_SCRIPT, "startup": STARTUP_SCRIPT, "fork": FORK_SCRIPT}
+
+
+def _environment(database_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{database_path}"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def time_script(script: str, database_path: str) -> dict:
+    """Run one sample in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, env=_environment(database_path),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(database_path: str, limit: int = 15) -> List[Tuple[str, float]]:
+    """Modules with the most cumulative import time, in milliseconds"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR,
+        env=_environment(database_path), capture_output=True, text=True, check=True
+    )
+    # Lines read "import time: self [us] | cumulative | imported package"
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(cumulative) / 1000))
+    return sorted(modules, key=lambda module: module[1], reverse=True)[:limit]
+
+
+def run_suite(runs: int, scenarios: List[str] = None) -> Dict[str, dict]:
+    """
+    Time each scenario over `runs` fresh interpreters
+    Raises RuntimeError if any run created the database
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "bench.db")
+        for name in scenarios or list(SCENARIOS):
+            durations = []
+            for _ in range(runs):
+                durations.append(time_script(SCENARIOS[name], database_path)[name])
+                # startup may create the schema; importing must not
+                if name != "startup" and os.path.exists(database_path):
+                    raise RuntimeError(f"Importing app.main created {database_path}")
+                if os.path.exists(database_path):
+                    os.remove(database_path)
+            results[name] = summarize(durations)
+    return results
+
+
+def print_results(results: Dict[str, dict]) -> None:
+    print(f"{'scenario':<10} {'runs':>5} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<10} {result['requests']:>5} {result['mean_ms']:>9.1f} "
+              f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20, help="fresh interpreters per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--output", default="bench_import_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="results JSON to check this run against")
+    parser.add_argument("--thresholds", help='JSON {"default"|scenario: {metric: fraction}}')
+    args = parser.parse_args()
+
+    if "fork" in args.scenarios and not hasattr(os, "fork"):
+        parser.error("the fork scenario needs os.fork")
+
+    results = run_suite(args.runs, args.scenarios)
+    print_results(results)
+
+    if args.top:
+        with tempfile.TemporaryDirectory() as tmp:
+            print("\nSlowest imports (cumulative ms):")
+            for name, ms in slowest_imports(os.path.join(tmp, "bench.db"), args.top):
+                print(f"  {ms:>8.1f}  {name}")
+
+    current = document({"runs": args.runs, "scenarios": args.scenarios}, results)
+    save(args.output, current)
+
+    if args.baseline:
+        sys.exit(report_regressions(load(args.baseline), current, args.thresholds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: /health/records serialization, response_model vs fast path
+
+Builds a throwaway SQLite database holding one page of records and
+times turning it into the JSON response body both ways:
+  * response_model: ORM objects validated into HealthRecordResponse,
+    dumped, run through jsonable_encoder and rendered by JSONResponse
+  * fast path: Core row tuples encoded by serialize_record_rows
+
+Both include the query. The bodies are checked to be byte-identical.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [--rows 1000] [--repeat 200]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import User
+from app.models.health_record import HealthRecord
+from app.schemas.health import HealthRecordResponse
+from app.services.health_service import RESPONSE_COLUMNS, serialize_record_rows
+
+RESPONSE_ADAPTER = TypeAdapter(List[HealthRecordResponse])
+ORDER = (HealthRecord.measured_at.desc(), HealthRecord.id.desc())
+
+
+def seed(session, rows: int) -> int:
+    """Insert one user with `rows` mixed records a minute apart"""
+    user = User(email="bench@healthsync.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    session.execute(HealthRecord.__table__.insert(), [
+        {
+            "user_id": user.id,
+            "measurement_type": ("weight", "heart_rate", "steps")[i % 3],
+            "value": 60 + (i % 40) * 0.5,
+            "unit": ("kg", "bpm", "steps")[i % 3],
+            "notes": "after run" if i % 5 == 0 else None,
+            "measured_at": start + timedelta(minutes=i)
+        }
+        for i in range(rows)
+    ])
+    session.commit()
+    return user.id
+
+
+def response_model_body(session, user_id: int, limit: int) -> bytes:
+    """The body FastAPI builds from a response_model=List[HealthRecordResponse]"""
+    # Drop loaded objects so every run builds them like a fresh request
+    session.expunge_all()
+    records = session.scalars(
+        select(HealthRecord).where(HealthRecord.user_id == user_id).order_by(*ORDER).limit(limit)
+    ).all()
+    models = RESPONSE_ADAPTER.validate_python(records, from_attributes=True)
+    content = jsonable_encoder(RESPONSE_ADAPTER.dump_python(models, mode="json"))
+    return JSONResponse(content).body
+
+
+def fast_body(session, user_id: int, limit: int) -> bytes:
+    rows = session.execute(
+        select(*RESPONSE_COLUMNS).where(HealthRecord.user_id == user_id).order_by(*ORDER).limit(limit)
+    ).all()
+    return serialize_record_rows(rows)
+
+
+def timed(fn, repeat: int, *args):
+    """Run fn `repeat` times; returns (last result, mean seconds per call)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000, help="records per page")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+
+        user_id = seed(session, args.rows)
+
+        slow, slow_time = timed(response_model_body, args.repeat, session, user_id, args.rows)
+        fast, fast_time = timed(fast_body, args.repeat, session, user_id, args.rows)
+
+        assert slow == fast, "payloads differ"
+
+        print(f"{args.rows:,} records, {len(fast):,} bytes per page")
+        print(f"response_model : {slow_time * 1000:8.2f} ms/page")
+        print(f"fast path      : {fast_time * 1000:8.2f} ms/page")
+        print(f"speedup        : {slow_time / fast_time:8.1f}x")
+
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Synthetic data generator for the benchmarks
+
+Seeds N users with M records each, spread over every MeasurementType
+with plausible units and values, then rebuilds the rollups so the
+database looks like one the API wrote itself. Values come from a seeded
+NumPy generator, so reruns produce the same data, and rows go in with
+chunked executemany inserts through the partition routing layer.
+
+Usage (from backend/):
+    python -m benchmarks.datagen sqlite:///./bench.db [--users 100] [--records 1000]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from typing import List
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.database import Base
+from app.core.security import pwd_context
+from app.models.user import User
+from app.schemas.health import MeasurementType
+from app.services.partition_service import insert_record_rows
+from app.services.rollup_service import rebuild_rollups
+
+PASSWORD = "benchpass123"
+START = datetime(2024, 1, 1)
+# Rows per INSERT; keeps each executemany batch's memory flat
+CHUNK = 50_000
+
+# Unit, mean and standard deviation per measurement type
+PROFILES = {
+    MeasurementType.WEIGHT: ("kg", 75.0, 12.0),
+    MeasurementType.HEIGHT: ("cm", 172.0, 9.0),
+    MeasurementType.BODY_FAT: ("%", 22.0, 6.0),
+    MeasurementType.HEART_RATE: ("bpm", 70.0, 10.0),
+    MeasurementType.BLOOD_PRESSURE_SYSTOLIC: ("mmHg", 120.0, 12.0),
+    MeasurementType.BLOOD_PRESSURE_DIASTOLIC: ("mmHg", 80.0, 8.0),
+    MeasurementType.BODY_TEMPERATURE: ("celsius", 36.8, 0.3),
+    MeasurementType.STEPS: ("steps", 8000.0, 3000.0),
+    MeasurementType.CALORIES_BURNED: ("kcal", 2200.0, 400.0),
+    MeasurementType.EXERCISE_MINUTES: ("minutes", 35.0, 20.0),
+    MeasurementType.SLEEP_HOURS: ("hours", 7.2, 1.1),
+    MeasurementType.MOOD_RATING: ("scale", 6.5, 1.8),
+    MeasurementType.STRESS_LEVEL: ("scale", 4.5, 2.0),
+    MeasurementType.BLOOD_GLUCOSE: ("mg/dL", 95.0, 15.0),
+}
+
+
+def user_email(index: int) -> str:
+    return f"bench{index}@healthsync.com"
+
+
+def seed_users(db: Session, users: int, bcrypt_rounds: int) -> List[int]:
+    """
+    Insert `users` users sharing PASSWORD; returns their ids
+    The password is hashed once, at the given bcrypt cost
+    """
+    hashed = pwd_context.copy(bcrypt__rounds=bcrypt_rounds).hash(PASSWORD)
+    db.execute(User.__table__.insert(), [
+        {"email": user_email(i), "hashed_password": hashed, "timezone": "UTC"}
+        for i in range(users)
+    ])
+    db.commit()
+    return list(db.scalars(User.__table__.select().with_only_columns(User.id).order_by(User.id)))
+
+
+def seed_records(db: Session, user_ids: List[int], records: int, random_seed: int = 0) -> int:
+    """
+    Insert `records` records per user, drawn across every measurement type
+    Each user's samples are spaced evenly over the year from START.
+    Returns the number of rows inserted.
+    """
+    rng = np.random.default_rng(random_seed)
+    types = list(PROFILES)
+    means = np.array([PROFILES[t][1] for t in types])
+    deviations = np.array([PROFILES[t][2] for t in types])
+    step = timedelta(days=365) / max(records, 1)
+
+    inserted = 0
+    rows = []
+    for user_id in user_ids:
+        kinds = rng.integers(0, len(types), records)
+        values = np.round(np.abs(rng.normal(means[kinds], deviations[kinds])), 1)
+        for i in range(records):
+            kind = types[kinds[i]]
+            rows.append({
+                "user_id": user_id,
+                "measurement_type": kind.value,
+                "value": float(values[i]),
+                "unit": PROFILES[kind][0],
+                "notes": "synthetic" if i % 10 == 0 else None,
+                "measured_at": START + step * i
+            })
+            if len(rows) >= CHUNK:
+                insert_record_rows(db, rows)
+                db.commit()
+                inserted += len(rows)
+                rows = []
+    if rows:
+        insert_record_rows(db, rows)
+        db.commit()
+        inserted += len(rows)
+
+    rebuild_rollups(db)
+    return inserted
+
+
+def seed(db: Session, users: int, records: int, bcrypt_rounds: int, random_seed: int = 0) -> List[int]:
+    """Seed users and their records; returns the user ids"""
+    user_ids = seed_users(db, users, bcrypt_rounds)
+    seed_records(db, user_ids, records, random_seed)
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("database_url", help="e.g. sqlite:///./bench.db; created if missing")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--records", type=int, default=1000, help="records per user")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        seed(db, args.users, args.records, args.bcrypt_rounds, args.seed)
+        print(f"Seeded {args.users:,} users x {args.records:,} records")
+    finally:
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark results files: writing, loading and regression checks
+
+Every benchmark writes {"meta": {...}, "scenarios": {name: metrics}},
+where metrics hold any of p50_ms/p95_ms/p99_ms/mean_ms and
+throughput_rps. Any two files can be compared, whichever benchmark
+produced them:
+
+    python -m benchmarks.results BASELINE CURRENT [--thresholds FILE]
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+
+# Allowed relative change before a metric counts as a regression:
+# latencies may grow by this fraction, throughput may drop by it
+DEFAULT_THRESHOLDS = {
+    "p50_ms": 0.20,
+    "p95_ms": 0.25,
+    "p99_ms": 0.50,
+    "throughput_rps": 0.20,
+}
+
+
+def summarize(latencies: List[float], elapsed: Optional[float] = None, errors: int = 0) -> dict:
+    """Latency percentiles for one scenario, and throughput given the elapsed time"""
+    ms = np.array(latencies) * 1000
+    metrics = {"requests": len(latencies), "errors": errors}
+    if elapsed is not None:
+        metrics["throughput_rps"] = round(len(latencies) / elapsed, 2)
+    return {
+        **metrics,
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def compare(baseline: dict, current: dict, thresholds: Optional[dict] = None) -> List[str]:
+    """
+    Metrics in current that regressed against baseline past their threshold
+    thresholds maps scenario name (or "default") to {metric: fraction},
+    falling back to DEFAULT_THRESHOLDS. Returns one message per regression.
+    """
+    thresholds = thresholds or {}
+    regressions = []
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        limits = {**DEFAULT_THRESHOLDS, **thresholds.get("default", {}), **thresholds.get(name, {})}
+        for metric, allowed in limits.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            # Throughput regresses downwards, latency upwards
+            change = (old - new) / old if metric == "throughput_rps" else (new - old) / old
+            if change > allowed:
+                regressions.append(
+                    f"{name}.{metric}: {old:g} -> {new:g} ({change:+.0%} worse, allowed {allowed:.0%})"
+                )
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def document(config: dict, scenarios: dict) -> dict:
+    """A results file body for the current commit and machine"""
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": config,
+        },
+        "scenarios": scenarios,
+    }
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path: str, results: dict) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {path}")
+
+
+def report_regressions(baseline: dict, current: dict, thresholds_path: Optional[str]) -> int:
+    """Print regressions against baseline; returns the exit status"""
+    thresholds = load(thresholds_path) if thresholds_path else None
+    regressions = compare(baseline, current, thresholds)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print(f"No regressions against {baseline['meta'].get('commit') or 'baseline'}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark results files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--thresholds", help='JSON {"default"|scenario: {metric: fraction}}')
+    args = parser.parse_args()
+    sys.exit(report_regressions(load(args.baseline), load(args.current), args.thresholds))
+
+
+if __name__ == "__main__":
+    main()
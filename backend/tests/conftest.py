@@ -1,11 +1,27 @@
+import os
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
+
+# Cheap bcrypt cost for tests; must be set before the app reads settings
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# Check every request against its route's query budget
+os.environ.setdefault("QUERY_BUDGET_MIDDLEWARE", "true")
+# Tests create their own tables; keep startup off the app database
+os.environ.setdefault("AUTO_CREATE_SCHEMA", "false")
 
 from app.main import app
-from app.core.database import Base, get_db
+from app.core.database import (
+    Base, get_async_db, get_async_session_factory, get_session_factory, set_sqlite_pragmas, to_async_url
+)
+from app.core.deps import user_cache
+from app.core.metrics import instrument_engine
+from app.core.query_budget import track_queries, violation_listeners
+from app.core.slow_queries import track_slow_queries
+from app.api.health import response_cache
 from app.models.user import User
 from app.models.health_record import HealthRecord
 
@@ -18,6 +34,21 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the API routes; NullPool since each TestClient runs
+# its own event loop
+async_engine = create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Same connection tuning as production
+event.listen(engine, "connect", set_sqlite_pragmas)
+event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+track_queries(engine)
+track_queries(async_engine.sync_engine)
+track_slow_queries(engine)
+track_slow_queries(async_engine.sync_engine)
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database session for each test"""
@@ -32,16 +63,51 @@ def db_session():
 @pytest.fixture(scope="function")
 def client(db_session):
     """Create a test client with test database"""
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
     
-    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: TestingAsyncSessionLocal
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+    # User ids and data versions are reused once the test database is recreated
+    user_cache.clear()
+    response_cache.clear()
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
+    user_cache.clear()
+    response_cache.clear()
+
+@pytest.fixture(autouse=True)
+def query_budget_violations():
+    """
+    Fail the test if any request exceeds its route's query budget or
+    repeats a statement shape (N+1); tests expecting one clear the list
+    """
+    violations = []
+
+    def record(queries, messages):
+        violations.append(f"{queries.method} {queries.route}: {'; '.join(messages)}")
+
+    violation_listeners.append(record)
+    yield violations
+    violation_listeners.remove(record)
+    assert not violations, "\n".join(violations)
+
+@pytest.fixture
+def captured_statements():
+    """Record every SQL statement the API routes send to the test database"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
 
 @pytest.fixture
 def test_user_data():
@@ -52,6 +118,15 @@ def test_user_data():
         "birth_date": "1990-06-15"
     }
 
+@pytest.fixture
+def test_user(db_session):
+    """A user saved directly through the test session"""
+    user = User(email="test@example.com", hashed_password="hash")
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+    return user
+
 @pytest.fixture
 def test_health_record_data():
     """Sample health record data for testing"""
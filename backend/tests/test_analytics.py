@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from datetime import datetime
+from app.models.user import User
+from app.models.health_record import HealthRecord
+from app.services.analytics_service import (
+    Series, load_series, rolling_mean, ewma, percentiles,
+    day_over_day_deltas, streaks, summarize, SECONDS_PER_DAY
+)
+
+def make_series(day_values):
+    """Helper function to build a series with one sample per (day, value) at noon"""
+    timestamps = np.array([day * SECONDS_PER_DAY + 43200 for day, _ in day_values], dtype=float)
+    values = np.array([value for _, value in day_values], dtype=float)
+    return Series(timestamps=timestamps, values=values)
+
+def test_rolling_mean_matches_loop():
+    """Test vectorized rolling mean against a plain loop"""
+    values = np.random.default_rng(1).normal(70, 5, 200)
+    window = 7
+
+    expected = [values[max(0, i - window + 1):i + 1].mean() for i in range(len(values))]
+
+    assert rolling_mean(values, window) == pytest.approx(expected)
+
+def test_ewma_matches_recurrence():
+    """Test blockwise EWMA against the recurrence, across several blocks"""
+    values = np.random.default_rng(2).normal(70, 5, 5000)
+    alpha = 0.5
+
+    expected = [values[0]]
+    for x in values[1:]:
+        expected.append(alpha * x + (1 - alpha) * expected[-1])
+
+    assert ewma(values, alpha) == pytest.approx(expected)
+
+def test_percentiles():
+    """Test percentiles of a known distribution"""
+    values = np.arange(1, 101, dtype=float)
+
+    result = percentiles(values, (50, 90))
+
+    assert result[50] == pytest.approx(50.5)
+    assert result[90] == pytest.approx(90.1)
+
+def test_day_over_day_deltas_skip_gaps():
+    """Test deltas only compare consecutive calendar days"""
+    series = make_series([(10, 100), (10, 200), (11, 180), (13, 190)])
+
+    days, deltas = day_over_day_deltas(series)
+
+    assert days.tolist() == [10, 11, 13]
+    assert np.isnan(deltas[0])
+    assert deltas[1] == pytest.approx(30)  # 180 - mean(100, 200)
+    assert np.isnan(deltas[2])
+
+def test_streaks():
+    """Test longest and current streaks of consecutive days"""
+    days = np.array([1, 2, 3, 5, 6, 9, 10])
+
+    assert streaks(days, latest_day=10) == {"longest": 3, "current": 2}
+    assert streaks(days, latest_day=11) == {"longest": 3, "current": 2}
+    assert streaks(days, latest_day=12) == {"longest": 3, "current": 0}
+
+def test_summarize_streak_threshold():
+    """Test streaks can require a minimum daily mean"""
+    series = make_series([(1, 12000), (2, 11000), (3, 4000), (4, 10500)])
+
+    stats = summarize(series, window=2, alpha=0.5, today=4, streak_min=10000)
+
+    assert stats["count"] == 4
+    assert stats["longest_streak"] == 2
+    assert stats["current_streak"] == 1
+    assert stats["rolling_mean"] == pytest.approx(7250)
+
+def test_load_series(db_session):
+    """Test a series loads in time order with epoch timestamps"""
+    user = User(email="test@example.com", hashed_password="hash")
+    db_session.add(user)
+    db_session.commit()
+
+    for hour, value in [(10, 72.0), (8, 70.0), (9, 71.0)]:
+        db_session.add(HealthRecord(user_id=user.id, measurement_type="heart_rate", value=value,
+                                    unit="bpm", measured_at=datetime(2024, 1, 1, hour)))
+    db_session.add(HealthRecord(user_id=user.id, measurement_type="weight", value=75.0,
+                                unit="kg", measured_at=datetime(2024, 1, 1, 8)))
+    db_session.commit()
+
+    series = load_series(db_session, user.id, "heart_rate")
+
+    assert series.values.tolist() == [70.0, 71.0, 72.0]
+    assert series.timestamps[0] == pytest.approx(1704096000, abs=0.01)  # 2024-01-01T08:00:00Z
@@ -1,6 +1,9 @@
 import pytest
 from fastapi import status
 from app.core.security import hash_password, create_access_token
+from app.core.deps import user_cache
+from app.core.security import password_pool
+from app.models.user import User
 
 def test_register_user(client, test_user_data):
     """Test user registration endpoint"""
@@ -89,4 +92,64 @@ def test_get_current_user_invalid_token(client):
     headers = {"Authorization": "Bearer invalid_token"}
     response = client.get("/api/v1/auth/me", headers=headers)
     
-    assert response.status_code == status.HTTP_401_UNAUTHORIZED
\ No newline at end of file
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_current_user_cached(client, test_user_data):
+    """Test repeat requests are served from the user cache"""
+    client.post("/api/v1/auth/register", json=test_user_data)
+    login_response = client.post("/api/v1/auth/login", json={
+        "email": test_user_data["email"],
+        "password": test_user_data["password"]
+    })
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    for _ in range(3):
+        response = client.get("/api/v1/auth/me", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+
+    assert user_cache.misses == 1
+    assert user_cache.hits == 2
+
+def test_deactivated_user_invalidated(client, db_session, test_user_data):
+    """Test deactivating a user evicts it from the user cache"""
+    client.post("/api/v1/auth/register", json=test_user_data)
+    login_response = client.post("/api/v1/auth/login", json={
+        "email": test_user_data["email"],
+        "password": test_user_data["password"]
+    })
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == status.HTTP_200_OK
+
+    # Deactivate through the ORM
+    user = db_session.query(User).filter(User.email == test_user_data["email"]).first()
+    user.is_active = False
+    db_session.commit()
+
+    response = client.get("/api/v1/auth/me", headers=headers)
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_user_invalidated_after_commit(db_session, test_user_data):
+    """Test a user cached between flush and commit is evicted at commit"""
+    user = User(email=test_user_data["email"], hashed_password="hash")
+    db_session.add(user)
+    db_session.commit()
+
+    user.is_active = False
+    db_session.flush()
+    # A concurrent request still reads the committed, active row
+    user_cache.set(user.id, "stale snapshot")
+    db_session.commit()
+
+    assert user_cache.get(user.id) is None
+
+
+def test_register_rejected_when_password_pool_saturated(client, test_user_data, monkeypatch):
+    """Test registration fails fast with 503 when hashing is saturated"""
+    monkeypatch.setattr(password_pool, "max_pending", 0)
+
+    response = client.post("/api/v1/auth/register", json=test_user_data)
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
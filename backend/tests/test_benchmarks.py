@@ -0,0 +1,41 @@
+from benchmarks import bench_import
+from benchmarks.bench_api import SCENARIOS, run_suite
+from benchmarks.results import compare
+
+def results(**scenarios):
+    """Helper function to wrap per-scenario metrics like a saved results file"""
+    return {"meta": {}, "scenarios": scenarios}
+
+def test_compare_flags_regressions_past_threshold():
+    """Test slower latencies and lower throughput are reported per metric"""
+    baseline = results(records={"p50_ms": 10.0, "p95_ms": 20.0, "throughput_rps": 100.0})
+
+    assert compare(baseline, results(records={"p50_ms": 11.0, "p95_ms": 24.0, "throughput_rps": 90.0})) == []
+
+    regressions = compare(baseline, results(records={"p50_ms": 10.0, "p95_ms": 30.0, "throughput_rps": 70.0}))
+    assert [message.split(":")[0] for message in regressions] == ["records.p95_ms", "records.throughput_rps"]
+
+    # Per-scenario thresholds override the defaults
+    assert compare(baseline, results(records={"p95_ms": 30.0}), {"records": {"p95_ms": 1.0}}) == []
+
+def test_compare_skips_scenarios_missing_from_baseline():
+    """Test new scenarios have nothing to regress against"""
+    assert compare(results(), results(login={"p95_ms": 500.0})) == []
+
+def test_run_suite(tmp_path):
+    """Test every scenario runs error-free against a small seeded database"""
+    suite = run_suite(str(tmp_path / "bench.db"), users=2, records=50, requests=6,
+                      concurrency=2, warmup=1, bcrypt_rounds=4)
+
+    assert list(suite) == list(SCENARIOS)
+    for result in suite.values():
+        assert result["requests"] == 6
+        assert result["errors"] == 0
+        assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+def test_import_suite():
+    """Test importing app.main is timed and leaves no database behind"""
+    suite = bench_import.run_suite(runs=1, scenarios=["import", "fork"])
+
+    assert list(suite) == ["import", "fork"]
+    assert all(result["p50_ms"] > 0 for result in suite.values())
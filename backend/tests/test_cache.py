@@ -0,0 +1,108 @@
+import time
+import pytest
+from app.core.cache import SizedLRUCache, TTLCache, load_cache_backend
+
+def test_cache_get_set():
+    """Test cached values are returned and counted as hits"""
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    assert cache.get("a") is None
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+def test_cache_entry_expires():
+    """Test entries are dropped once their deadline passes"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, expires_at=time.monotonic() - 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_cache_evicts_least_recently_used():
+    """Test the least recently used entry is evicted when full"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Touch "a" so "b" becomes the eviction candidate
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+def test_cache_invalidate_and_stats():
+    """Test explicit invalidation and hit ratio reporting"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.invalidate("a")
+    cache.get("a")
+
+    stats = cache.stats()
+    assert stats["size"] == 0
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == pytest.approx(0.5)
+
+def test_sized_cache_evicts_by_bytes():
+    """Test least recently used entries go once the byte budget is exceeded"""
+    cache = SizedLRUCache(max_bytes=10, maxsize=100)
+    cache.set("a", b"aaaa", 4)
+    cache.set("b", b"bbbb", 4)
+    cache.get("a")
+
+    cache.set("c", b"cccc", 4)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.bytes == 8
+    assert cache.evictions == 1
+
+def test_sized_cache_skips_oversized_entries():
+    """Test an entry larger than the whole cache is not stored"""
+    cache = SizedLRUCache(max_bytes=10, maxsize=100)
+    cache.set("a", b"a", 1)
+
+    cache.set("big", b"x" * 11, 11)
+
+    assert cache.get("big") is None
+    assert cache.get("a") == b"a"
+
+def test_sized_cache_replace_updates_bytes():
+    """Test overwriting a key accounts for the old entry's size"""
+    cache = SizedLRUCache(max_bytes=100, maxsize=100)
+    cache.set("a", b"a" * 10, 10)
+    cache.set("a", b"a" * 4, 4)
+    cache.invalidate("a")
+
+    assert cache.bytes == 0
+    assert len(cache) == 0
+
+def test_sized_cache_stats():
+    """Test the hit ratio reported for monitoring"""
+    cache = SizedLRUCache(max_bytes=100, maxsize=100)
+    cache.set("a", b"a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+
+    stats = cache.stats()
+
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == pytest.approx(2 / 3)
+    assert stats["bytes"] == 1
+
+def test_load_cache_backend():
+    """Test backends are built from the setting's spelling"""
+    assert isinstance(load_cache_backend("memory", 100, 10), SizedLRUCache)
+    assert load_cache_backend("none", 100, 10) is None
+    assert isinstance(load_cache_backend("collections:OrderedDict", 100, 10), dict)
+
+    with pytest.raises(ValueError):
+        load_cache_backend("redis", 100, 10)
@@ -1,6 +1,6 @@
 import pytest
-from sqlalchemy import text
-from app.core.database import engine, SessionLocal, Base, get_db
+from sqlalchemy import create_engine, inspect, text
+from app.core.database import engine, SessionLocal, Base, create_schema, get_db, get_async_db, to_async_url
 
 def test_database_connection():
     """Test database connection works"""
@@ -33,6 +33,34 @@ def test_get_db_dependency():
     except StopIteration:
         pass  # Expected
 
+def test_sqlite_pragmas_applied():
+    """Test the connect hook applies the configured SQLite pragmas"""
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+def test_to_async_url():
+    """Test sync database URLs map to their async drivers"""
+    assert to_async_url("sqlite:///./healthsync.db") == "sqlite+aiosqlite:///./healthsync.db"
+    assert to_async_url("postgresql://u:p@db/healthsync") == "postgresql+asyncpg://u:p@db/healthsync"
+    assert to_async_url("sqlite+aiosqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+
+@pytest.mark.asyncio
+async def test_get_async_db_dependency():
+    """Test get_async_db dependency function"""
+    db_generator = get_async_db()
+    db = await db_generator.__anext__()
+
+    result = await db.execute(text("SELECT 1"))
+    assert result.scalar() == 1
+
+    # Clean up
+    try:
+        await db_generator.__anext__()
+    except StopAsyncIteration:
+        pass  # Expected
+
 def test_database_tables_creation():
     """Test that database tables can be created"""
     # This should not raise an exception
@@ -65,4 +93,13 @@ def test_database_tables_cleanup():
         result = connection.execute(text(
             "SELECT name FROM sqlite_master WHERE type='table' AND name='users'"
         ))
-        assert result.fetchone() is None
\ No newline at end of file
+        assert result.fetchone() is None
+
+def test_create_schema(tmp_path):
+    """Test the explicit schema step creates every model's table"""
+    bind = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    create_schema(bind)
+
+    tables = set(inspect(bind).get_table_names())
+    assert {"users", "health_records", "health_record_aggregates", "import_jobs"} <= tables
+    bind.dispose()
@@ -1,6 +1,18 @@
+import csv
+import io
+import json
 import pytest
 from fastapi import status
-from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from datetime import datetime, timedelta, timezone
+from typing import List
+from app.models.health_record import HealthRecord
+from app.schemas.health import HealthRecordResponse
+from app.services.health_service import serialize_record_rows
+from app.services.version_service import etag_matches
+from app.api.health import response_cache
 
 def get_auth_headers(client, test_user_data):
     """Helper function to get authorization headers"""
@@ -167,4 +179,483 @@ def test_user_can_only_see_own_records(client):
     
     assert response.status_code == status.HTTP_200_OK
     data = response.json()
-    assert len(data) == 0  # User2 should see no records
\ No newline at end of file
+    assert len(data) == 0  # User2 should see no records
+
+def test_get_health_records_newest_first(client, test_user_data):
+    """Test health records are returned in a stable newest-first order"""
+    headers = get_auth_headers(client, test_user_data)
+
+    for day in (3, 1, 2):
+        client.post("/api/v1/health/records", json={
+            "measurement_type": "weight",
+            "value": 70 + day,
+            "unit": "kg",
+            "measured_at": f"2024-01-0{day}T08:00:00Z"
+        }, headers=headers)
+
+    response = client.get("/api/v1/health/records", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    values = [r["value"] for r in response.json()]
+    assert values == [73, 72, 71]
+
+def test_get_health_records_cursor_pagination(client, test_user_data):
+    """Test keyset pagination walks every record exactly once"""
+    headers = get_auth_headers(client, test_user_data)
+
+    # Two records share a timestamp to exercise the id tie-breaker
+    timestamps = ["2024-01-01T08:00:00Z", "2024-01-02T08:00:00Z",
+                  "2024-01-02T08:00:00Z", "2024-01-03T08:00:00Z",
+                  "2024-01-04T08:00:00Z"]
+    for i, ts in enumerate(timestamps):
+        client.post("/api/v1/health/records", json={
+            "measurement_type": "heart_rate",
+            "value": 60 + i,
+            "unit": "bpm",
+            "measured_at": ts
+        }, headers=headers)
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/api/v1/health/records", params=params, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        seen.extend(r["id"] for r in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params = {"limit": 2, "cursor": next_cursor}
+
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+def test_get_health_records_cursor_with_aware_end_date(client, test_user_data):
+    """Test cursor pages combine with a timezone-aware end_date"""
+    headers = get_auth_headers(client, test_user_data)
+
+    for day in range(1, 6):
+        client.post("/api/v1/health/records", json={
+            "measurement_type": "heart_rate",
+            "value": 60 + day,
+            "unit": "bpm",
+            "measured_at": f"2024-01-0{day}T08:00:00Z"
+        }, headers=headers)
+
+    seen = []
+    params = {"limit": 2, "end_date": "2024-12-31T00:00:00Z"}
+    while True:
+        response = client.get("/api/v1/health/records", params=params, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        seen.extend(r["value"] for r in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params = {"limit": 2, "end_date": "2024-12-31T00:00:00Z", "cursor": next_cursor}
+
+    assert seen == [65, 64, 63, 62, 61]
+
+def test_get_health_records_invalid_cursor(client, test_user_data):
+    """Test a malformed cursor is rejected"""
+    headers = get_auth_headers(client, test_user_data)
+
+    response = client.get("/api/v1/health/records", params={"cursor": "not-a-cursor"}, headers=headers)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_get_health_records_matches_response_model(client, db_session, test_user_data):
+    """Test the fast serialization path is byte-identical to the response_model path"""
+    headers = get_auth_headers(client, test_user_data)
+    client.post("/api/v1/health/quick-add", json={
+        "weight_kg": 75,
+        "heart_rate_bpm": 61,
+        "mood_rating": 8
+    }, headers=headers)
+    client.post("/api/v1/health/records", json={
+        "measurement_type": "steps",
+        "value": 12000.0,
+        "unit": "steps",
+        "notes": "Après la course 🏃",
+        "measured_at": "2024-01-01T08:30:00.123456+00:00"
+    }, headers=headers)
+
+    response = client.get("/api/v1/health/records", headers=headers)
+
+    # Rebuild the body the way FastAPI serializes a response_model
+    records = db_session.query(HealthRecord).order_by(
+        HealthRecord.measured_at.desc(), HealthRecord.id.desc()
+    ).all()
+    models = TypeAdapter(List[HealthRecordResponse]).validate_python(records, from_attributes=True)
+    content = jsonable_encoder(TypeAdapter(List[HealthRecordResponse]).dump_python(models, mode="json"))
+    assert len(records) == 4
+    assert response.content == JSONResponse(content).body
+
+def test_serialize_record_rows_timezones():
+    """Test aware datetimes are written the way pydantic writes them"""
+    rows = [
+        (1, "weight", 75, "kg", None,
+         datetime(2024, 1, 1, 8, tzinfo=timezone.utc),
+         datetime(2024, 1, 1, 8, 0, 0, 5, tzinfo=timezone(timedelta(hours=-3, minutes=-30))))
+    ]
+    expected = [HealthRecordResponse(**dict(zip(HealthRecordResponse.model_fields, rows[0])))]
+
+    body = serialize_record_rows(rows)
+
+    assert body == JSONResponse(jsonable_encoder(
+        TypeAdapter(List[HealthRecordResponse]).dump_python(expected, mode="json")
+    )).body
+    assert b'"2024-01-01T08:00:00Z"' in body
+
+def test_get_health_summary_date_range(client, test_user_data):
+    """Test summary date range and latest measurements come from SQL aggregates"""
+    headers = get_auth_headers(client, test_user_data)
+
+    for ts in ("2024-03-01T08:00:00Z", "2024-01-01T08:00:00Z", "2024-02-01T08:00:00Z"):
+        client.post("/api/v1/health/records", json={
+            "measurement_type": "steps",
+            "value": 1000,
+            "unit": "steps",
+            "measured_at": ts
+        }, headers=headers)
+
+    response = client.get("/api/v1/health/summary", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["date_range"]["earliest"].startswith("2024-01-01T08:00:00")
+    assert data["date_range"]["latest"].startswith("2024-03-01T08:00:00")
+    assert data["latest_measurement"][0]["measured_at"].startswith("2024-03-01T08:00:00")
+
+def test_bulk_add_health_records_json(client, test_user_data):
+    """Test bulk upload of a JSON array with per-item errors"""
+    headers = get_auth_headers(client, test_user_data)
+
+    records = [
+        {"measurement_type": "heart_rate", "value": 60 + i % 40, "unit": "bpm",
+         "measured_at": f"2024-01-01T{i // 60 % 24:02d}:{i % 60:02d}:00Z"}
+        for i in range(2500)
+    ]
+    records[10] = {"measurement_type": "not_a_type", "value": 1, "unit": "x"}
+    records[20] = {"measurement_type": "steps", "unit": "steps"}
+
+    response = client.post("/api/v1/health/records/bulk", json=records, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["received"] == 2500
+    assert data["inserted"] == 2498
+    assert data["failed"] == 2
+    assert [error["index"] for error in data["errors"]] == [10, 20]
+
+    summary = client.get("/api/v1/health/summary", headers=headers).json()
+    assert summary["total_records"] == 2498
+
+def test_write_paths_store_same_utc_time(client, test_user_data):
+    """Test single and bulk writes store an offset timestamp as the same UTC instant"""
+    headers = get_auth_headers(client, test_user_data)
+    sample = {"measurement_type": "heart_rate", "value": 60, "unit": "bpm",
+              "measured_at": "2024-01-01T08:00:00+02:00"}
+
+    client.post("/api/v1/health/records", json=sample, headers=headers)
+    client.post("/api/v1/health/records/bulk", json=[sample], headers=headers)
+
+    records = client.get("/api/v1/health/records", headers=headers).json()
+    assert [r["measured_at"][:19] for r in records] == ["2024-01-01T06:00:00"] * 2
+
+def test_bulk_add_health_records_ndjson(client, test_user_data):
+    """Test bulk upload of NDJSON including an unparseable line"""
+    headers = get_auth_headers(client, test_user_data)
+
+    body = "\n".join([
+        '{"measurement_type": "steps", "value": 1200, "unit": "steps"}',
+        '{not json',
+        '{"measurement_type": "weight", "value": 75.5, "unit": "kg"}',
+        ''
+    ])
+
+    response = client.post(
+        "/api/v1/health/records/bulk",
+        content=body,
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["received"] == 3
+    assert data["inserted"] == 2
+    assert data["errors"][0]["index"] == 1
+
+def test_bulk_add_health_records_invalid_body(client, test_user_data):
+    """Test bulk upload rejects a body that is not a list of records"""
+    headers = get_auth_headers(client, test_user_data)
+
+    response = client.post("/api/v1/health/records/bulk", json={"foo": 1}, headers=headers)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_quick_add_statement_count(client, test_user_data, captured_statements):
+    """Test quick-add costs the same statements regardless of record count"""
+    headers = get_auth_headers(client, test_user_data)
+    captured_statements.clear()
+
+    quick_data = {
+        "weight_kg": 75.5,
+        "heart_rate_bpm": 72,
+        "steps": 8500,
+        "sleep_hours": 7.5,
+        "mood_rating": 8
+    }
+    response = client.post("/api/v1/health/quick-add", json=quick_data, headers=headers)
+
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert len(data) == 5
+    assert all(record["id"] and record["created_at"] for record in data)
+
+    # User lookup, one INSERT ... RETURNING for records, one rollup upsert,
+    # one data version upsert
+    assert len(captured_statements) == 4
+    record_statements = [s for s in captured_statements if "health_records" in s]
+    assert len(record_statements) == 1
+    assert record_statements[0].startswith("INSERT")
+    assert "RETURNING" in record_statements[0]
+
+def test_create_health_record_statement_count(client, test_user_data, test_health_record_data, captured_statements):
+    """Test creating a record does not re-select it after commit"""
+    headers = get_auth_headers(client, test_user_data)
+    captured_statements.clear()
+
+    response = client.post("/api/v1/health/records", json=test_health_record_data, headers=headers)
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["created_at"] is not None
+    assert not any(s.startswith("SELECT") and "health_records" in s for s in captured_statements)
+    assert len(captured_statements) == 4
+
+def test_get_health_series_daily(client, test_user_data):
+    """Test series aggregates per day in SQL"""
+    headers = get_auth_headers(client, test_user_data)
+
+    samples = [
+        ("2024-01-01T08:00:00Z", 60), ("2024-01-01T20:00:00Z", 80),
+        ("2024-01-02T09:30:00Z", 70),
+    ]
+    client.post("/api/v1/health/records/bulk", json=[
+        {"measurement_type": "heart_rate", "value": value, "unit": "bpm", "measured_at": ts}
+        for ts, value in samples
+    ] + [{"measurement_type": "steps", "value": 500, "unit": "steps", "measured_at": "2024-01-01T10:00:00Z"}],
+        headers=headers)
+
+    response = client.get("/api/v1/health/series", params={
+        "measurement_type": "heart_rate", "bucket": "day"
+    }, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    points = response.json()["points"]
+    assert len(points) == 2
+    assert points[0]["bucket_start"].startswith("2024-01-01T00:00:00")
+    assert points[0]["count"] == 2
+    assert points[0]["avg"] == 70
+    assert points[0]["min"] == 60
+    assert points[0]["max"] == 80
+    assert points[1]["count"] == 1
+
+def test_get_health_series_weekly(client, test_user_data):
+    """Test weekly buckets start on Monday and respect the date range"""
+    headers = get_auth_headers(client, test_user_data)
+
+    # 2024-01-01 is a Monday, 2024-01-07 a Sunday, 2024-01-08 the next Monday
+    client.post("/api/v1/health/records/bulk", json=[
+        {"measurement_type": "weight", "value": value, "unit": "kg", "measured_at": ts}
+        for ts, value in [("2024-01-01T08:00:00Z", 75), ("2024-01-07T08:00:00Z", 76),
+                          ("2024-01-08T08:00:00Z", 77), ("2024-02-01T08:00:00Z", 78)]
+    ], headers=headers)
+
+    response = client.get("/api/v1/health/series", params={
+        "measurement_type": "weight", "bucket": "week", "end_date": "2024-01-31T00:00:00Z"
+    }, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    points = response.json()["points"]
+    assert [p["bucket_start"][:10] for p in points] == ["2024-01-01", "2024-01-08"]
+    assert [p["count"] for p in points] == [2, 1]
+
+def test_get_health_analytics(client, test_user_data):
+    """Test analytics endpoint summarizes one measurement type"""
+    headers = get_auth_headers(client, test_user_data)
+
+    client.post("/api/v1/health/records/bulk", json=[
+        {"measurement_type": "steps", "value": value, "unit": "steps", "measured_at": ts}
+        for ts, value in [("2024-01-01T20:00:00Z", 8000), ("2024-01-02T20:00:00Z", 12000),
+                          ("2024-01-03T20:00:00Z", 11000)]
+    ], headers=headers)
+
+    response = client.get("/api/v1/health/analytics", params={
+        "measurement_type": "steps", "window": 2, "streak_min": 10000
+    }, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["count"] == 3
+    assert data["mean"] == pytest.approx(31000 / 3)
+    assert data["rolling_mean"] == 11500
+    assert data["day_over_day_delta"] == -1000
+    assert data["longest_streak"] == 2
+
+def test_get_health_analytics_empty(client, test_user_data):
+    """Test analytics for a measurement type with no records"""
+    headers = get_auth_headers(client, test_user_data)
+
+    response = client.get("/api/v1/health/analytics", params={"measurement_type": "weight"}, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["count"] == 0
+
+def test_export_health_records_csv(client, test_user_data):
+    """Test CSV export streams every matching record in time order"""
+    headers = get_auth_headers(client, test_user_data)
+
+    client.post("/api/v1/health/records/bulk", json=[
+        {"measurement_type": "heart_rate", "value": 60 + i % 30, "unit": "bpm",
+         "notes": "with, comma" if i == 0 else None,
+         "measured_at": f"2024-01-{1 + i // 1440:02d}T{i // 60 % 24:02d}:{i % 60:02d}:00Z"}
+        for i in range(2500)
+    ] + [{"measurement_type": "weight", "value": 75, "unit": "kg"}], headers=headers)
+
+    response = client.get("/api/v1/health/export", params={
+        "format": "csv", "measurement_types": ["heart_rate"]
+    }, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 2500
+    assert rows[0]["notes"] == "with, comma"
+    assert rows[0]["measured_at"] < rows[-1]["measured_at"]
+    assert {row["measurement_type"] for row in rows} == {"heart_rate"}
+
+def test_export_health_records_ndjson(client, test_user_data):
+    """Test NDJSON export honours the date range filter"""
+    headers = get_auth_headers(client, test_user_data)
+
+    client.post("/api/v1/health/records/bulk", json=[
+        {"measurement_type": "weight", "value": 70 + day, "unit": "kg",
+         "measured_at": f"2024-01-0{day}T08:00:00Z"}
+        for day in range(1, 6)
+    ], headers=headers)
+
+    response = client.get("/api/v1/health/export", params={
+        "format": "ndjson", "start_date": "2024-01-02T00:00:00Z", "end_date": "2024-01-04T23:59:59Z"
+    }, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["value"] for line in lines] == [72, 73, 74]
+    assert set(lines[0]) == {"id", "measurement_type", "value", "unit", "notes", "measured_at", "created_at"}
+
+def test_conditional_get_not_modified(client, test_user_data, test_health_record_data, captured_statements):
+    """Test a matching If-None-Match is answered with 304 without reading records"""
+    headers = get_auth_headers(client, test_user_data)
+    client.post("/api/v1/health/records", json=test_health_record_data, headers=headers)
+
+    for path in ("/api/v1/health/summary", "/api/v1/health/records"):
+        response = client.get(path, headers=headers)
+        etag = response.headers["ETag"]
+        assert response.status_code == status.HTTP_200_OK
+
+        captured_statements.clear()
+        response = client.get(path, headers={**headers, "If-None-Match": etag})
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+        assert not any("health_record" in s for s in captured_statements)
+
+def test_conditional_get_after_write(client, test_user_data, test_health_record_data):
+    """Test every kind of write changes the ETag"""
+    headers = get_auth_headers(client, test_user_data)
+    etags = [client.get("/api/v1/health/summary", headers=headers).headers["ETag"]]
+
+    client.post("/api/v1/health/records", json=test_health_record_data, headers=headers)
+    etags.append(client.get("/api/v1/health/summary", headers=headers).headers["ETag"])
+
+    client.post("/api/v1/health/quick-add", json={"steps": 1000}, headers=headers)
+    etags.append(client.get("/api/v1/health/summary", headers=headers).headers["ETag"])
+
+    client.post("/api/v1/health/records/bulk", json=[test_health_record_data], headers=headers)
+    response = client.get("/api/v1/health/summary", headers={**headers, "If-None-Match": etags[-1]})
+    etags.append(response.headers["ETag"])
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(set(etags)) == 4
+
+def test_conditional_get_varies_by_query(client, test_user_data):
+    """Test the ETag depends on the query parameters but not their order"""
+    headers = get_auth_headers(client, test_user_data)
+
+    def etag(params):
+        return client.get("/api/v1/health/records", params=params, headers=headers).headers["ETag"]
+
+    assert etag([("limit", "10")]) != etag([("limit", "20")])
+    assert etag([("limit", "10"), ("offset", "5")]) == etag([("offset", "5"), ("limit", "10")])
+
+def test_etag_matches():
+    """Test If-None-Match parsing"""
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('"x", W/"abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches('W/"abd"', 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
+
+def test_get_health_records_cached(client, test_user_data, captured_statements):
+    """Test repeated record queries are served from the response cache"""
+    headers = get_auth_headers(client, test_user_data)
+    client.post("/api/v1/health/quick-add", json={"weight_kg": 75, "steps": 1000}, headers=headers)
+    response_cache.clear()
+
+    params = [("measurement_types", "weight"), ("measurement_types", "steps"), ("limit", "1")]
+    first = client.get("/api/v1/health/records", params=params, headers=headers)
+
+    # Same filter set, types in a different order
+    captured_statements.clear()
+    params = [("limit", "1"), ("measurement_types", "steps"), ("measurement_types", "weight")]
+    second = client.get("/api/v1/health/records", params=params, headers=headers)
+
+    assert second.content == first.content
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert not any("health_records" in s for s in captured_statements)
+    assert response_cache.stats()["hits"] == 1
+
+def test_get_health_records_offset_spellings_match(client, test_user_data):
+    """Test two spellings of one instant return the same rows, cached or not"""
+    headers = get_auth_headers(client, test_user_data)
+    for value, ts in [(7, "2024-01-01T07:00:00Z"), (9, "2024-01-01T09:00:00Z")]:
+        client.post("/api/v1/health/records", json={
+            "measurement_type": "heart_rate", "value": value, "unit": "bpm", "measured_at": ts
+        }, headers=headers)
+
+    for end_date in ["2024-01-01T10:00:00+02:00", "2024-01-01T08:00:00Z"]:
+        response = client.get("/api/v1/health/records", params={"end_date": end_date}, headers=headers)
+        assert [r["value"] for r in response.json()] == [7]
+
+def test_get_health_records_cache_invalidated_by_write(client, test_user_data, test_health_record_data):
+    """Test a write makes cached pages unreachable"""
+    headers = get_auth_headers(client, test_user_data)
+    assert client.get("/api/v1/health/records", headers=headers).json() == []
+
+    client.post("/api/v1/health/records", json=test_health_record_data, headers=headers)
+
+    assert len(client.get("/api/v1/health/records", headers=headers).json()) == 1
+
+def test_get_health_summary_cached(client, test_user_data, test_health_record_data, captured_statements):
+    """Test a cached summary matches the freshly built one"""
+    headers = get_auth_headers(client, test_user_data)
+    client.post("/api/v1/health/records", json=test_health_record_data, headers=headers)
+
+    first = client.get("/api/v1/health/summary", headers=headers)
+    captured_statements.clear()
+    second = client.get("/api/v1/health/summary", headers=headers)
+
+    assert second.content == first.content
+    assert second.json()["total_records"] == 1
+    assert not any("health_record" in s for s in captured_statements)
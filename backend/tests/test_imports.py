@@ -0,0 +1,252 @@
+import json
+import os
+import pytest
+from fastapi import status
+from starlette.requests import ClientDisconnect
+from app.core.config import settings
+from app.models.user import User
+from app.models.health_record import HealthRecord
+from app.models.import_job import ImportJob
+from app.services import import_service
+from app.services.import_service import claim_import, run_import, normalize_measurement_type
+from app.services.version_service import get_data_version
+from app.schemas.health import MeasurementType
+from tests.conftest import TestingSessionLocal
+from tests.test_health_api import get_auth_headers
+
+@pytest.fixture(autouse=True)
+def import_dir(tmp_path, monkeypatch):
+    """Keep uploaded files in a temporary directory"""
+    monkeypatch.setattr(settings, "IMPORT_DIR", str(tmp_path))
+    return tmp_path
+
+def make_csv(rows):
+    """Helper function to build a third-party style CSV export"""
+    lines = ["Type,startDate,Value,Unit"]
+    lines += [f"{t},{ts},{v},{u}" for t, ts, v, u in rows]
+    return "\n".join(lines) + "\n"
+
+def test_normalize_measurement_type():
+    """Test source type names map onto MeasurementType"""
+    assert normalize_measurement_type("weight") == MeasurementType.WEIGHT
+    assert normalize_measurement_type("Heart Rate") == MeasurementType.HEART_RATE
+    assert normalize_measurement_type("StepCount") == MeasurementType.STEPS
+    assert normalize_measurement_type("unknown_metric") is None
+
+def test_import_csv(client, test_user_data, import_dir):
+    """Test a CSV import maps columns, defaults units and reports progress"""
+    headers = get_auth_headers(client, test_user_data)
+
+    body = make_csv([
+        ("HeartRate", "2024-01-01T08:00:00Z", 61, "count/min"),
+        ("StepCount", "2024-01-01T09:00:00Z", 1200, ""),
+        ("NotAType", "2024-01-01T10:00:00Z", 1, "x"),
+        ("Body Mass", "2024-01-01T11:00:00Z", 75.5, "kg"),
+    ])
+
+    response = client.post(
+        "/api/v1/health/imports",
+        params={"format": "csv", "column_map": json.dumps({"measured_at": "startDate"})},
+        content=body,
+        headers={**headers, "Content-Type": "text/csv"}
+    )
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["id"]
+    assert response.json()["bytes_total"] == len(body.encode())
+
+    # The background job has run by the time the test client returns
+    response = client.get(f"/api/v1/health/imports/{job_id}", headers=headers)
+    data = response.json()
+    assert data["status"] == "completed"
+    assert data["progress"] == 1.0
+    assert data["rows_inserted"] == 3
+    assert data["rows_failed"] == 1
+    assert os.listdir(import_dir) == []
+
+    records = client.get("/api/v1/health/records", headers=headers).json()
+    units = {r["measurement_type"]: r["unit"] for r in records}
+    assert units == {"heart_rate": "count/min", "steps": "steps", "weight": "kg"}
+
+def test_oversized_import_leaves_no_file(client, test_user_data, import_dir, monkeypatch):
+    """Test an upload over IMPORT_MAX_BYTES is rejected and its partial file removed"""
+    headers = get_auth_headers(client, test_user_data)
+    monkeypatch.setattr(settings, "IMPORT_MAX_BYTES", 10)
+
+    response = client.post(
+        "/api/v1/health/imports", params={"format": "csv"},
+        content=make_csv([("weight", "2024-01-01T08:00:00Z", 75, "kg")]), headers=headers
+    )
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert os.listdir(import_dir) == []
+
+def test_disconnected_import_leaves_no_file(client, test_user_data, import_dir):
+    """Test a client disconnecting mid-upload leaves no partial file behind"""
+    headers = get_auth_headers(client, test_user_data)
+    messages = [
+        {"type": "http.request", "body": b"Type,startDate,Value,Unit\n", "more_body": True},
+        {"type": "http.disconnect"},
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        pass
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "server": ("testserver", 80), "client": ("testclient", 50000),
+        "path": "/api/v1/health/imports", "raw_path": b"/api/v1/health/imports",
+        "root_path": "", "query_string": b"format=csv",
+        "headers": [(b"host", b"testserver"), (b"authorization", headers["Authorization"].encode())],
+    }
+    with pytest.raises(ClientDisconnect):
+        client.portal.call(client.app, scope, receive, send)
+
+    assert os.listdir(import_dir) == []
+
+def test_import_ndjson(client, test_user_data):
+    """Test an NDJSON import, including an unreadable line"""
+    headers = get_auth_headers(client, test_user_data)
+
+    body = "\n".join([
+        json.dumps({"type": "weight", "value": 75, "timestamp": "2024-01-01T08:00:00Z"}),
+        "{broken",
+        json.dumps({"type": "sleep", "value": 7.5, "timestamp": "2024-01-01T07:00:00Z"}),
+    ])
+
+    response = client.post(
+        "/api/v1/health/imports",
+        params={"format": "ndjson"},
+        content=body,
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    job = client.get(f"/api/v1/health/imports/{response.json()['id']}", headers=headers).json()
+
+    assert job["status"] == "completed"
+    assert job["rows_inserted"] == 2
+    assert job["rows_failed"] == 1
+
+def test_import_not_found_for_other_user(client, test_user_data):
+    """Test users can't see each other's imports"""
+    headers = get_auth_headers(client, test_user_data)
+    response = client.post(
+        "/api/v1/health/imports", params={"format": "csv"},
+        content=make_csv([]), headers=headers
+    )
+    job_id = response.json()["id"]
+
+    other_headers = get_auth_headers(client, {"email": "other@test.com", "password": "testpass123"})
+    response = client.get(f"/api/v1/health/imports/{job_id}", headers=other_headers)
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_completed_import_cannot_resume(client, test_user_data):
+    """Test resuming a finished import is rejected"""
+    headers = get_auth_headers(client, test_user_data)
+    response = client.post(
+        "/api/v1/health/imports", params={"format": "csv"},
+        content=make_csv([("weight", "2024-01-01T08:00:00Z", 75, "kg")]), headers=headers
+    )
+
+    response = client.post(f"/api/v1/health/imports/{response.json()['id']}/resume", headers=headers)
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+def test_interrupted_import_resumes_without_duplicates(db_session, import_dir, monkeypatch):
+    """Test a failed import resumes after its last committed chunk"""
+    user = User(email="test@example.com", hashed_password="hash")
+    db_session.add(user)
+    db_session.commit()
+
+    path = import_dir / "upload.csv"
+    path.write_text(make_csv([
+        ("weight", f"2024-01-{day:02d}T08:00:00Z", 70 + day, "kg") for day in range(1, 11)
+    ]))
+    job = ImportJob(user_id=user.id, file_format="csv", file_path=str(path),
+                    bytes_total=path.stat().st_size, status="running")
+    db_session.add(job)
+    db_session.commit()
+
+    # Fail while committing the third chunk
+    real_update = import_service.update_rollups_from_rows
+    calls = []
+    def flaky_update(db, user_id, rows):
+        calls.append(len(rows))
+        if len(calls) == 3:
+            raise RuntimeError("disk full")
+        real_update(db, user_id, rows)
+    monkeypatch.setattr(import_service, "update_rollups_from_rows", flaky_update)
+
+    run_import(TestingSessionLocal, job.id, chunk_size=3)
+    db_session.expire_all()
+    job = db_session.get(ImportJob, job.id)
+    assert job.status == "failed"
+    assert job.error == "disk full"
+    assert job.rows_inserted == 6
+    assert 0 < job.committed_offset < job.bytes_total
+
+    monkeypatch.setattr(import_service, "update_rollups_from_rows", real_update)
+    assert claim_import(db_session, job.id)
+    run_import(TestingSessionLocal, job.id, chunk_size=3)
+    db_session.expire_all()
+    job = db_session.get(ImportJob, job.id)
+
+    assert job.status == "completed"
+    assert job.rows_inserted == 10
+    values = sorted(r.value for r in db_session.query(HealthRecord).all())
+    assert values == [71.0 + i for i in range(10)]
+    # One version bump per committed chunk, none for the rolled back one
+    assert get_data_version(db_session, user.id) == 4
+
+def make_running_job(db_session, import_dir, days=6):
+    """Helper function to create a claimed CSV import job"""
+    user = User(email="test@example.com", hashed_password="hash")
+    db_session.add(user)
+    db_session.commit()
+
+    path = import_dir / "upload.csv"
+    path.write_text(make_csv([
+        ("weight", f"2024-01-{day:02d}T08:00:00Z", 70 + day, "kg") for day in range(1, days + 1)
+    ]))
+    job = ImportJob(user_id=user.id, file_format="csv", file_path=str(path),
+                    bytes_total=path.stat().st_size, status="running")
+    db_session.add(job)
+    db_session.commit()
+    return job
+
+def test_resume_claims_job_once(db_session, import_dir):
+    """Test only one of two concurrent resumes claims a failed job"""
+    job = make_running_job(db_session, import_dir)
+    job.status = "failed"
+    db_session.commit()
+
+    assert claim_import(db_session, job.id)
+    assert not claim_import(db_session, job.id)
+    db_session.expire_all()
+    assert db_session.get(ImportJob, job.id).status == "running"
+
+def test_runner_that_lost_its_claim_stops(db_session, import_dir, monkeypatch):
+    """Test a stale runner rolls back instead of inserting rows a newer runner owns"""
+    job = make_running_job(db_session, import_dir)
+
+    # Another runner commits the first chunk while this one validates it
+    real_validate = import_service.validate_bulk_items
+    def racing_validate(user_id, items):
+        other = TestingSessionLocal()
+        other.get(ImportJob, job.id).committed_offset = 1
+        other.commit()
+        other.close()
+        return real_validate(user_id, items)
+    monkeypatch.setattr(import_service, "validate_bulk_items", racing_validate)
+
+    run_import(TestingSessionLocal, job.id, chunk_size=3)
+    db_session.expire_all()
+    job = db_session.get(ImportJob, job.id)
+
+    assert job.status == "running"
+    assert job.committed_offset == 1
+    assert job.rows_inserted == 0
+    assert db_session.query(HealthRecord).count() == 0
@@ -0,0 +1,74 @@
+import re
+from app.core.config import settings
+from app.core.metrics import Histogram, registry
+from tests.test_health_api import get_auth_headers
+
+def sample(text, name, **labels):
+    """Helper function to read one sample's value from a scrape"""
+    selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}{re.escape('{' + selector + '}') if selector else ''} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else None
+
+def test_histogram_render():
+    """Test buckets are cumulative and end with +Inf"""
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 5)
+
+    lines = [f"{name} {labels} {value}" for name, _, labels, value in histogram.samples()]
+    assert lines == [
+        "latency_seconds_bucket ('/a', '0.1') 1",
+        "latency_seconds_bucket ('/a', '1') 2",
+        "latency_seconds_bucket ('/a', '+Inf') 3",
+        "latency_seconds_sum ('/a',) 5.55",
+        "latency_seconds_count ('/a',) 3",
+    ]
+
+def test_metrics_endpoint(client, test_user_data):
+    """Test requests are counted per route template with their DB work"""
+    registry.clear()
+    headers = get_auth_headers(client, test_user_data)
+    client.get("/api/v1/health/records", headers=headers)
+    client.get("/api/v1/health/records", headers=headers)
+    client.get("/api/v1/health/imports/999", headers=headers)
+    client.get("/no/such/path")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    records = {"method": "GET", "route": "/api/v1/health/records"}
+    assert sample(text, "http_requests_total", **records, status="200") == 2
+    assert sample(text, "http_request_duration_seconds_count", **records) == 2
+    assert sample(text, "http_request_duration_seconds_bucket", **records, le="+Inf") == 2
+    assert sample(text, "http_requests_total", method="GET", route="/api/v1/health/imports/{job_id}", status="404") == 1
+    assert sample(text, "http_requests_total", method="GET", route="unmatched", status="404") == 1
+
+    # User, data version and page queries, then only the version once cached
+    assert sample(text, "http_request_db_queries_sum", **records) == 4
+    assert sample(text, "http_request_db_seconds_count", **records) == 2
+    assert sample(text, "db_queries_total") > 0
+    assert sample(text, "http_requests_in_flight") == 1
+
+    assert sample(text, "cache_hits_total", cache="user") >= 1
+    assert sample(text, "cache_size", cache="response") is not None
+
+def test_background_tasks_not_counted(client, test_user_data, tmp_path, monkeypatch):
+    """Test an import's background run isn't counted against the request that queued it"""
+    monkeypatch.setattr(settings, "IMPORT_DIR", str(tmp_path))
+    headers = get_auth_headers(client, test_user_data)
+    body = "type,measured_at,value,unit\n" + "".join(
+        f"weight,2024-01-{day:02d}T08:00:00Z,{70 + day},kg\n" for day in range(1, 21)
+    )
+    registry.clear()
+
+    response = client.post("/api/v1/health/imports", params={"format": "csv"}, content=body, headers=headers)
+    assert response.status_code == 202
+    assert client.get(f"/api/v1/health/imports/{response.json()['id']}", headers=headers).json()["rows_inserted"] == 20
+
+    text = client.get("/metrics").text
+    imports = {"method": "POST", "route": "/api/v1/health/imports"}
+    # Creating the job only; the import's own inserts ran after the response
+    assert sample(text, "http_request_db_queries_sum", **imports) <= 3
@@ -0,0 +1,159 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import inspect, select
+from app.core.config import settings
+from app.models.health_record import HealthRecord
+from app.models.health_rollup import HealthRecordRollup
+from app.models.record_partition import HealthRecordPartition
+from app.services.partition_service import (
+    drop_partitions_before, insert_record_rows, migrate_to_partitions, month_start, record_tables
+)
+from app.services.rollup_service import rebuild_rollups
+from app.services.version_service import get_data_version
+from tests.conftest import engine
+from tests.test_health_api import get_auth_headers
+
+@pytest.fixture
+def partitioned(monkeypatch):
+    """Store records in monthly partitions for the test"""
+    monkeypatch.setattr(settings, "RECORD_PARTITIONING", True)
+
+def make_rows(user_id, days):
+    """Helper function to build one weight row per (month, day)"""
+    return [
+        {"user_id": user_id, "measurement_type": "weight", "value": 70.0 + i,
+         "unit": "kg", "measured_at": datetime(2024, month, day, 8)}
+        for i, (month, day) in enumerate(days)
+    ]
+
+def add_records(client, headers):
+    """Helper function to bulk upload records spread over three months"""
+    records = [
+        {"measurement_type": "weight", "value": 70.0 + i, "unit": "kg",
+         "measured_at": f"2024-{month:02d}-{day:02d}T08:00:00"}
+        for i, (month, day) in enumerate([(1, 30), (1, 31), (2, 1), (2, 15), (3, 1)])
+    ]
+    response = client.post("/api/v1/health/records/bulk", json=records, headers=headers)
+    assert response.json()["inserted"] == 5
+
+def test_month_start():
+    """Test aware timestamps route by their UTC month"""
+    eastern = timezone(timedelta(hours=-5))
+
+    assert month_start(datetime(2024, 1, 31, 22, tzinfo=eastern)) == datetime(2024, 2, 1)
+    assert month_start(datetime(2024, 1, 31, 22)) == datetime(2024, 1, 1)
+
+def test_insert_routes_rows_to_monthly_tables(db_session, test_user, partitioned):
+    """Test each row lands in its month's table with a unique id"""
+
+    inserted = insert_record_rows(db_session, make_rows(test_user.id, [(1, 5), (2, 5), (1, 6)]), returning=True)
+    db_session.commit()
+
+    assert [row.id for row in inserted] == [1, 2, 3]
+    assert [row.value for row in inserted] == [70.0, 71.0, 72.0]
+    assert {t.name for t in record_tables(db_session)} == {"health_records_2024_01", "health_records_2024_02"}
+    assert db_session.query(HealthRecord).count() == 0
+
+    # Ids keep counting across later inserts and partitions
+    inserted = insert_record_rows(db_session, make_rows(test_user.id, [(3, 1)]), returning=True)
+    assert inserted[0].id == 4
+
+def test_record_tables_prunes_by_date_range(db_session, test_user, partitioned):
+    """Test a date range only routes to the months it covers"""
+    insert_record_rows(db_session, make_rows(test_user.id, [(1, 15), (2, 15), (3, 15), (4, 15)]))
+    db_session.commit()
+
+    tables = record_tables(db_session, datetime(2024, 2, 10), datetime(2024, 3, 20), newest_first=True)
+
+    assert [t.name for t in tables] == ["health_records_2024_03", "health_records_2024_02"]
+
+def test_partitioned_api(client, test_user_data, partitioned):
+    """Test the read endpoints merge results across partitions"""
+    headers = get_auth_headers(client, test_user_data)
+    add_records(client, headers)
+
+    # Newest first across partitions, paged with the cursor
+    values, params = [], {"limit": 2}
+    while True:
+        response = client.get("/api/v1/health/records", params=params, headers=headers)
+        values += [record["value"] for record in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert values == [74.0, 73.0, 72.0, 71.0, 70.0]
+
+    # Offsets skip whole partitions
+    response = client.get("/api/v1/health/records", params={"offset": 3, "limit": 5}, headers=headers)
+    assert [record["value"] for record in response.json()] == [71.0, 70.0]
+
+    summary = client.get("/api/v1/health/summary", headers=headers).json()
+    assert summary["total_records"] == 5
+    assert [record["value"] for record in summary["latest_measurement"]] == [74.0, 73.0, 72.0, 71.0, 70.0]
+
+    # The week of Jan 29 spans the January and February tables
+    series = client.get("/api/v1/health/series", params={
+        "measurement_type": "weight", "bucket": "week"
+    }, headers=headers).json()
+    assert series["points"][0]["bucket_start"].startswith("2024-01-29")
+    assert series["points"][0]["count"] == 3
+
+    analytics = client.get("/api/v1/health/analytics", params={"measurement_type": "weight"}, headers=headers).json()
+    assert analytics["count"] == 5
+    assert analytics["longest_streak"] == 3
+
+    export = client.get("/api/v1/health/export", params={"format": "ndjson"}, headers=headers)
+    exported = [json.loads(line) for line in export.text.splitlines()]
+    assert [record["value"] for record in exported] == [70.0, 71.0, 72.0, 73.0, 74.0]
+
+def test_partitioned_range_query_skips_other_months(client, test_user_data, partitioned, captured_statements):
+    """Test a date-range listing doesn't read unrelated partitions"""
+    headers = get_auth_headers(client, test_user_data)
+    add_records(client, headers)
+    captured_statements.clear()
+
+    response = client.get("/api/v1/health/records", params={
+        "start_date": "2024-02-10T00:00:00", "end_date": "2024-02-20T00:00:00"
+    }, headers=headers)
+
+    assert [record["value"] for record in response.json()] == [73.0]
+    queried = " ".join(captured_statements)
+    assert "health_records_2024_02" in queried
+    assert "health_records_2024_01" not in queried
+    assert "health_records_2024_03" not in queried
+
+def test_drop_partitions_before(db_session, test_user, partitioned):
+    """Test old months are dropped as tables and rollups follow"""
+    insert_record_rows(db_session, make_rows(test_user.id, [(1, 15), (2, 15), (3, 15)]))
+    db_session.commit()
+    rebuild_rollups(db_session)
+
+    dropped = drop_partitions_before(db_session, datetime(2024, 3, 1))
+
+    assert dropped == ["health_records_2024_01", "health_records_2024_02"]
+    assert not inspect(engine).has_table("health_records_2024_01")
+    assert [t.name for t in record_tables(db_session)] == ["health_records_2024_03"]
+    rollup = db_session.query(HealthRecordRollup).one()
+    assert rollup.record_count == 1
+    assert rollup.value_sum == 72.0
+    assert get_data_version(db_session, test_user.id) == 1
+
+def test_migrate_to_partitions(db_session, test_user, monkeypatch):
+    """Test existing rows move into partitions with their ids"""
+    db_session.execute(HealthRecord.__table__.insert(), make_rows(test_user.id, [(1, 15), (2, 15), (2, 16)]))
+    db_session.commit()
+
+    moved = migrate_to_partitions(db_session, batch_size=2)
+    monkeypatch.setattr(settings, "RECORD_PARTITIONING", True)
+
+    assert moved == 3
+    assert db_session.query(HealthRecord).count() == 0
+    assert db_session.scalar(select(HealthRecordPartition.table_name).order_by(
+        HealthRecordPartition.month_start
+    )) == "health_records_2024_01"
+    february = record_tables(db_session)[1]
+    assert list(db_session.scalars(select(february.c.id).order_by(february.c.id))) == [2, 3]
+
+    # New records continue after the migrated ids
+    inserted = insert_record_rows(db_session, make_rows(test_user.id, [(3, 1)]), returning=True)
+    assert inserted[0].id == 4
@@ -0,0 +1,74 @@
+import pytest
+from app.core.config import settings
+from app.core.profiling import create_profile_token, verify_profile_token
+from tests.test_health_api import get_auth_headers
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    """Store profiles in a temporary directory"""
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+def test_profile_tokens():
+    """Test tokens verify until they expire and can't be forged"""
+    token, _ = create_profile_token()
+    expired, _ = create_profile_token(ttl=-10)
+    expires, _, signature = token.partition(".")
+
+    assert verify_profile_token(token)
+    assert not verify_profile_token(expired)
+    assert not verify_profile_token(f"{int(expires) + 60}.{signature}")
+    assert not verify_profile_token("garbage")
+
+def test_malformed_profile_tokens_ignored(client):
+    """Test crafted tokens are treated as invalid rather than failing the request"""
+    assert not verify_profile_token("9999999999.\u00e9")
+    assert not verify_profile_token("\u00b2.x")
+
+    response = client.get("/", headers={"X-Profile": "9999999999.\u00e9".encode("utf-8")})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+    response = client.get("/?_profile=%C2%B2.x")
+    assert response.status_code == 200
+
+def test_profiled_request(client, test_user_data, profile_dir, monkeypatch):
+    """Test a request with a token is profiled and the report retrievable by admins"""
+    headers = get_auth_headers(client, test_user_data)
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", [test_user_data["email"]])
+    token = client.post("/api/v1/admin/profile-token", headers=headers).json()["token"]
+
+    plain = client.get("/api/v1/health/summary", headers=headers)
+    assert "X-Profile-Id" not in plain.headers
+    assert list(profile_dir.iterdir()) == []
+
+    profiled = client.get("/api/v1/health/summary", headers={**headers, "X-Profile": token})
+    assert profiled.status_code == 200
+    assert profiled.json() == plain.json()
+    profile_id = profiled.headers["X-Profile-Id"]
+    assert (profile_dir / f"{profile_id}.prof").exists()
+
+    # The query flag works too
+    flagged = client.get("/api/v1/health/records", params={"_profile": token}, headers=headers)
+    assert flagged.headers["X-Profile-Id"] != profile_id
+
+    report = client.get(f"/api/v1/admin/profiles/{profile_id}", params={"limit": 1000}, headers=headers)
+    assert report.status_code == 200
+    assert "get_health_summary" in report.text
+
+    raw = client.get(f"/api/v1/admin/profiles/{profile_id}", params={"format": "pstats"}, headers=headers)
+    assert raw.content == (profile_dir / f"{profile_id}.prof").read_bytes()
+
+    assert client.get("/api/v1/admin/profiles/../../etc", headers=headers).status_code == 404
+    assert client.get(f"/api/v1/admin/profiles/{'0' * 32}", headers=headers).status_code == 404
+
+def test_invalid_token_not_profiled(client, test_user_data, profile_dir):
+    """Test a bad token is ignored and token minting is admin-only"""
+    headers = get_auth_headers(client, test_user_data)
+
+    assert client.post("/api/v1/admin/profile-token", headers=headers).status_code == 403
+    response = client.get("/api/v1/health/summary", headers={**headers, "X-Profile": "1.forged"})
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert list(profile_dir.iterdir()) == []
@@ -0,0 +1,60 @@
+from functools import partial
+from app.api import health as health_api
+from app.api.health import get_health_records
+from app.services.health_service import bulk_insert_rows
+from app.core.query_budget import RequestQueries, statement_shape
+from tests.test_health_api import get_auth_headers
+
+def test_statement_shape():
+    """Test statements differing only in values share a shape"""
+    assert statement_shape("SELECT * FROM t WHERE id IN (?, ?, ?)") == statement_shape("SELECT * FROM t WHERE id IN (?)")
+    assert statement_shape("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)") == "INSERT INTO t (a, b) VALUES (?)"
+    assert statement_shape("SELECT * FROM t WHERE a = 'x'\n  AND b = 42") == "SELECT * FROM t WHERE a = ? AND b = ?"
+    assert statement_shape("SELECT * FROM health_records_2024_01") == "SELECT * FROM health_records_2024_01"
+
+def test_request_queries_violations():
+    """Test budget overruns and repeated shapes are both reported"""
+    queries = RequestQueries(method="GET", route="/x", budget=3, statements=[
+        f"SELECT * FROM users WHERE id = {i}" for i in range(4)
+    ])
+
+    assert queries.violations(threshold=5) == ["4 queries, budget 3"]
+    assert queries.violations(threshold=4) == [
+        "4 queries, budget 3", "N+1: 4x SELECT * FROM users WHERE id = ?"
+    ]
+
+    queries.allow_repeats = True
+    assert queries.violations(threshold=4) == ["4 queries, budget 3"]
+
+def test_route_budget_is_enforced(client, test_user_data, query_budget_violations, monkeypatch):
+    """Test a request over its route's budget is reported"""
+    headers = get_auth_headers(client, test_user_data)
+    monkeypatch.setattr(get_health_records, "query_budget", 1)
+
+    client.get("/api/v1/health/records", headers=headers)
+
+    assert query_budget_violations == ["GET /api/v1/health/records: 3 queries, budget 1"]
+    query_budget_violations.clear()
+
+def test_quick_add_within_budget(client, test_user_data, query_budget_violations):
+    """Test quick-add stays within budget however many fields are given"""
+    headers = get_auth_headers(client, test_user_data)
+
+    response = client.post("/api/v1/health/quick-add", json={
+        "weight_kg": 70, "heart_rate_bpm": 60, "steps": 9000, "sleep_hours": 7.5, "mood_rating": 8
+    }, headers=headers)
+
+    assert len(response.json()) == 5
+    assert query_budget_violations == []
+
+def test_bulk_chunks_not_reported_as_n_plus_one(client, test_user_data, query_budget_violations, monkeypatch):
+    """Test bulk ingestion may repeat its per-chunk statements"""
+    headers = get_auth_headers(client, test_user_data)
+    monkeypatch.setattr(health_api, "bulk_insert_rows", partial(bulk_insert_rows, chunk_size=1))
+
+    response = client.post("/api/v1/health/records/bulk", json=[
+        {"measurement_type": "steps", "value": 1000 + i, "unit": "steps"} for i in range(12)
+    ], headers=headers)
+
+    assert response.json()["inserted"] == 12
+    assert query_budget_violations == []
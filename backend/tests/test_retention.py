@@ -0,0 +1,152 @@
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from app.core.database import set_sqlite_pragmas
+from app.models.health_record import HealthRecord
+from app.models.health_aggregate import HealthRecordAggregate
+from app.models.health_rollup import HealthRecordRollup
+from app.services.health_service import bulk_insert_rows
+from app.services import retention_service
+from app.services.retention_service import RetentionPolicy, compact, load_policies
+from app.services.rollup_service import rebuild_rollups
+from app.services.version_service import get_data_version
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TestingSessionLocal
+from tests.test_health_api import get_auth_headers
+
+NOW = datetime(2024, 6, 1)
+POLICIES = {"heart_rate": RetentionPolicy(raw_days=30, hourly_days=90)}
+
+def heart_rate_rows(user_id, times_and_values):
+    """Helper function to build raw heart-rate rows"""
+    return [
+        {"user_id": user_id, "measurement_type": "heart_rate", "value": value,
+         "unit": "bpm", "measured_at": measured_at}
+        for measured_at, value in times_and_values
+    ]
+
+def rollup_totals(db_session):
+    """Helper function to read the heart-rate rollup's running totals"""
+    rollup = db_session.query(HealthRecordRollup).filter_by(measurement_type="heart_rate").one()
+    return rollup.record_count, rollup.value_sum, rollup.value_sum_sq
+
+def test_load_policies():
+    """Test policies are parsed and validated"""
+    policies = load_policies({"steps": {"raw_days": 7, "hourly_days": 30}})
+    assert policies == {"steps": RetentionPolicy(raw_days=7, hourly_days=30)}
+
+    with pytest.raises(ValueError):
+        load_policies({"not_a_type": {"raw_days": 7, "hourly_days": 30}})
+    with pytest.raises(ValueError):
+        load_policies({"steps": {"raw_days": 30, "hourly_days": 7}})
+
+def test_compact_raw_into_hourly(db_session, test_user):
+    """Test old raw samples become hourly aggregates and recent ones stay"""
+    old = datetime(2024, 4, 1, 8)
+    bulk_insert_rows(db_session, test_user.id, heart_rate_rows(test_user.id, [
+        (old, 60), (old + timedelta(minutes=10), 80), (old + timedelta(minutes=70), 70),
+        (NOW - timedelta(days=1), 65)
+    ]) + [{"user_id": test_user.id, "measurement_type": "weight", "value": 75, "unit": "kg", "measured_at": old}])
+    totals_before = rollup_totals(db_session)
+    version_before = get_data_version(db_session, test_user.id)
+
+    totals = compact(db_session, now=NOW, batch_size=2, policies=POLICIES)
+
+    assert totals == {"raw": 3, "hourly": 0}
+    remaining = db_session.query(HealthRecord).order_by(HealthRecord.measured_at).all()
+    assert [(r.measurement_type, r.value) for r in remaining] == [("weight", 75.0), ("heart_rate", 65.0)]
+
+    hours = db_session.query(HealthRecordAggregate).order_by(HealthRecordAggregate.bucket_start).all()
+    assert [(a.resolution, a.bucket_start, a.sample_count) for a in hours] == [
+        ("hour", datetime(2024, 4, 1, 8), 2), ("hour", datetime(2024, 4, 1, 9), 1)
+    ]
+    assert (hours[0].value_sum, hours[0].value_min, hours[0].value_max) == (140.0, 60.0, 80.0)
+    assert hours[0].value_sum_sq == 60.0 ** 2 + 80.0 ** 2
+
+    # Totals survive compaction, and a rebuild agrees with them
+    assert get_data_version(db_session, test_user.id) > version_before
+    assert rollup_totals(db_session) == totals_before
+    rebuild_rollups(db_session)
+    assert rollup_totals(db_session) == totals_before
+
+def test_compact_hourly_into_daily(db_session, test_user):
+    """Test hourly aggregates past hourly_days become daily ones"""
+    day = datetime(2024, 1, 10)
+    bulk_insert_rows(db_session, test_user.id, heart_rate_rows(test_user.id, [
+        (day + timedelta(hours=8), 60), (day + timedelta(hours=9), 70), (day + timedelta(hours=20), 90)
+    ]))
+
+    totals = compact(db_session, now=NOW, policies=POLICIES)
+
+    assert totals == {"raw": 3, "hourly": 3}
+    aggregate = db_session.query(HealthRecordAggregate).one()
+    assert (aggregate.resolution, aggregate.bucket_start) == ("day", day)
+    assert (aggregate.sample_count, aggregate.value_sum) == (3, 220.0)
+    assert (aggregate.value_min, aggregate.value_max) == (60.0, 90.0)
+
+    # A second run has nothing left to do
+    assert compact(db_session, now=NOW, policies=POLICIES) == {"raw": 0, "hourly": 0}
+
+def test_concurrent_compactions_fold_rows_once(db_session, test_user, monkeypatch):
+    """Test a second run overlapping the first doesn't add the same batch twice"""
+    old = datetime(2024, 4, 1, 8)
+    bulk_insert_rows(db_session, test_user.id, heart_rate_rows(test_user.id, [
+        (old, 60), (old + timedelta(minutes=10), 80), (old + timedelta(minutes=20), 70)
+    ]))
+
+    # The second run, on its own connection, starts while the first is
+    # folding its batch
+    other_engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    event.listen(other_engine, "connect", set_sqlite_pragmas)
+    other_totals = []
+    def other_run():
+        db = Session(other_engine)
+        try:
+            other_totals.append(compact(db, now=NOW, policies=POLICIES))
+        finally:
+            db.close()
+    other = threading.Thread(target=other_run)
+
+    real_fold = retention_service._fold
+    def racing_fold(*args):
+        if not other.is_alive() and not other_totals:
+            other.start()
+            time.sleep(0.2)
+        real_fold(*args)
+    monkeypatch.setattr(retention_service, "_fold", racing_fold)
+
+    totals = compact(db_session, now=NOW, policies=POLICIES)
+    other.join()
+    other_engine.dispose()
+
+    assert totals["raw"] + other_totals[0]["raw"] == 3
+    aggregate = db_session.query(HealthRecordAggregate).one()
+    assert (aggregate.sample_count, aggregate.value_sum) == (3, 210.0)
+
+def test_series_unchanged_by_compaction(client, test_user_data):
+    """Test daily series read the same before and after compaction"""
+    headers = get_auth_headers(client, test_user_data)
+    start = datetime(2024, 4, 1, 6)
+    client.post("/api/v1/health/records/bulk", json=[
+        {"measurement_type": "heart_rate", "value": 60 + i % 7, "unit": "bpm",
+         "measured_at": (start + timedelta(minutes=37 * i)).isoformat()}
+        for i in range(100)
+    ], headers=headers)
+    params = {"measurement_type": "heart_rate", "bucket": "day"}
+    before = client.get("/api/v1/health/series", params=params, headers=headers).json()
+
+    db = TestingSessionLocal()
+    try:
+        assert compact(db, now=NOW, policies=POLICIES)["raw"] == 100
+    finally:
+        db.close()
+
+    after = client.get("/api/v1/health/series", params=params, headers=headers).json()
+    assert client.get("/api/v1/health/records", headers=headers).json() == []
+    assert [p["count"] for p in after["points"]] == [p["count"] for p in before["points"]]
+    for old, new in zip(before["points"], after["points"]):
+        assert new["bucket_start"] == old["bucket_start"]
+        assert new["avg"] == pytest.approx(old["avg"])
+        assert (new["min"], new["max"]) == (old["min"], old["max"])
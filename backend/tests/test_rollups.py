@@ -0,0 +1,59 @@
+import pytest
+from datetime import datetime
+from app.models.health_record import HealthRecord
+from app.models.health_rollup import HealthRecordRollup
+from app.services.rollup_service import update_rollups, rebuild_rollups
+
+def make_records(user_id):
+    """Helper function to build unsaved health records"""
+    return [
+        HealthRecord(user_id=user_id, measurement_type="weight", value=76.0,
+                     unit="kg", measured_at=datetime(2024, 1, 2, 8)),
+        HealthRecord(user_id=user_id, measurement_type="weight", value=75.0,
+                     unit="kg", measured_at=datetime(2024, 1, 3, 8)),
+        HealthRecord(user_id=user_id, measurement_type="weight", value=77.0,
+                     unit="kg", measured_at=datetime(2024, 1, 1, 8)),
+        HealthRecord(user_id=user_id, measurement_type="steps", value=9000,
+                     unit="steps", measured_at=datetime(2024, 1, 1, 20))
+    ]
+
+def test_update_rollups_accumulates(db_session, test_user):
+    """Test rollups accumulate across separate writes"""
+    records = make_records(test_user.id)
+
+    # Fold in two batches to exercise the upsert path
+    for batch in (records[:2], records[2:]):
+        db_session.add_all(batch)
+        update_rollups(db_session, test_user.id, batch)
+        db_session.commit()
+
+    weight = db_session.get(HealthRecordRollup, (test_user.id, "weight"))
+    assert weight.record_count == 3
+    assert weight.value_sum == pytest.approx(228.0)
+    assert weight.value_sum_sq == pytest.approx(76.0**2 + 75.0**2 + 77.0**2)
+    assert weight.first_measured_at == datetime(2024, 1, 1, 8)
+    assert weight.last_measured_at == datetime(2024, 1, 3, 8)
+    assert weight.last_value == 75.0
+
+    steps = db_session.get(HealthRecordRollup, (test_user.id, "steps"))
+    assert steps.record_count == 1
+
+def test_rebuild_rollups_matches_incremental(db_session, test_user):
+    """Test rebuilding from health_records repairs stale rollups"""
+    records = make_records(test_user.id)
+    db_session.add_all(records)
+    update_rollups(db_session, test_user.id, records)
+    db_session.commit()
+
+    # Simulate a manual data fix that bypassed the rollups
+    db_session.query(HealthRecord).filter(HealthRecord.value == 77.0).delete()
+    db_session.commit()
+
+    rebuild_rollups(db_session, test_user.id)
+    db_session.expire_all()
+
+    weight = db_session.get(HealthRecordRollup, (test_user.id, "weight"))
+    assert weight.record_count == 2
+    assert weight.value_sum == pytest.approx(151.0)
+    assert weight.first_measured_at == datetime(2024, 1, 2, 8)
+    assert weight.last_value == 75.0
@@ -71,6 +71,21 @@ class TestHealthSchemas:
         assert record.value == 68
         assert record.unit == "bpm"
     
+    def test_health_record_create_normalizes_to_utc(self):
+        """Test offsets are converted to UTC and naive timestamps taken as UTC"""
+        offset = HealthRecordCreate(
+            measurement_type=MeasurementType.HEART_RATE, value=68, unit="bpm",
+            measured_at="2024-01-01T08:00:00+02:00"
+        )
+        naive = HealthRecordCreate(
+            measurement_type=MeasurementType.HEART_RATE, value=68, unit="bpm",
+            measured_at="2024-01-01T06:00:00"
+        )
+
+        assert offset.measured_at == datetime(2024, 1, 1, 6, tzinfo=timezone.utc)
+        assert offset.measured_at.utcoffset() == timedelta(0)
+        assert naive.measured_at == offset.measured_at
+    
     def test_measurement_types(self):
         """Test all measurement types are available"""
         measurement_types = list(MeasurementType)
@@ -1,5 +1,12 @@
+import asyncio
+import time
 import pytest
-from app.core.security import hash_password, verify_password, create_access_token, verify_token
+from datetime import timedelta
+from app.core.config import settings
+from app.core.security import (
+    hash_password, verify_password, create_access_token, verify_token, token_cache,
+    hash_password_async, verify_password_async, PasswordHashPool, PasswordHasherBusy
+)
 
 def test_password_hashing():
     """Test password hashing functionality"""
@@ -85,4 +92,63 @@ def test_same_password_different_hashes():
     
     # But both should verify correctly
     assert verify_password(password, hash1) is True
-    assert verify_password(password, hash2) is True
\ No newline at end of file
+    assert verify_password(password, hash2) is True
+
+def test_jwt_verification_cached():
+    """Test repeat verification of a token is served from the cache"""
+    token = create_access_token(subject="789")
+
+    assert verify_token(token) == "789"
+    hits = token_cache.hits
+    assert verify_token(token) == "789"
+
+    assert token_cache.hits == hits + 1
+
+def test_tampered_token_not_served_from_cache():
+    """Test a modified token is verified on its own, not matched to the cached one"""
+    token = create_access_token(subject="789")
+    verify_token(token)
+
+    tampered = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+
+    assert verify_token(tampered) is None
+
+def test_cached_token_expires_with_token():
+    """Test a cached verification stops being valid at the token's exp"""
+    token = create_access_token(subject="789", expires_delta=timedelta(seconds=1))
+    assert verify_token(token) == "789"
+
+    time.sleep(2.1)
+
+    assert verify_token(token) is None
+
+
+def test_password_hash_uses_configured_rounds():
+    """Test bcrypt cost comes from settings"""
+    hashed = hash_password("mypassword123")
+
+    assert hashed.split("$")[2] == f"{settings.BCRYPT_ROUNDS:02d}"
+
+@pytest.mark.asyncio
+async def test_password_pool_hash_and_verify():
+    """Test hashing and verification through the process pool"""
+    hashed = await hash_password_async("mypassword123")
+
+    assert await verify_password_async("mypassword123", hashed) is True
+    assert await verify_password_async("wrongpassword", hashed) is False
+
+@pytest.mark.asyncio
+async def test_password_pool_rejects_when_saturated():
+    """Test new work is rejected immediately once the queue is full"""
+    pool = PasswordHashPool(max_workers=1, max_pending=1)
+    try:
+        first = asyncio.ensure_future(pool.run(time.sleep, 0.5))
+        await asyncio.sleep(0)
+
+        with pytest.raises(PasswordHasherBusy):
+            await pool.run(time.sleep, 0)
+
+        await first
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
@@ -0,0 +1,55 @@
+import logging
+from datetime import datetime
+from app.core.config import settings
+from app.core.slow_queries import SlowQueryLog, parameter_shape, slow_query_log
+from tests.test_health_api import get_auth_headers
+
+def test_parameter_shape():
+    """Test only parameter types are reported, never values"""
+    assert parameter_shape((1, "secret", datetime(2024, 1, 1)), False) == "(int, str, datetime)"
+    assert parameter_shape({"user_id": 1}, False) == "{user_id: int}"
+    assert parameter_shape([(1, 2.5), (2, 3.5)], True) == "2 x (int, float)"
+
+def test_top_orders_by_total_and_p95():
+    """Test the report ranks fingerprints and evicts the cheapest when full"""
+    log = SlowQueryLog(maxsize=2)
+    for _ in range(10):
+        log.record("SELECT a", 0.01)
+    log.record("SELECT b", 0.05)
+
+    assert [q["fingerprint"] for q in log.top(order_by="total")] == ["SELECT a", "SELECT b"]
+    assert [q["fingerprint"] for q in log.top(order_by="p95")] == ["SELECT b", "SELECT a"]
+
+    log.record("SELECT c", 0.2)
+    assert [q["fingerprint"] for q in log.top()] == ["SELECT c", "SELECT a"]
+
+def test_slow_queries_logged_with_plan(client, test_user_data, monkeypatch, caplog):
+    """Test slow statements are logged with route and query plan, and reported to admins"""
+    headers = get_auth_headers(client, test_user_data)
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0.0)
+    slow_query_log.clear()
+
+    with caplog.at_level(logging.WARNING, logger="app.core.slow_queries"):
+        client.get("/api/v1/health/records", params={"measurement_types": "weight"}, headers=headers)
+
+    page_query = [r.getMessage() for r in caplog.records if "FROM health_records" in r.getMessage()]
+    assert page_query
+    assert "on /api/v1/health/records" in page_query[0]
+    assert "params (int, str" in page_query[0]
+    assert "ix_health_records_user_type_measured" in page_query[0]
+
+    # Admins only
+    assert client.get("/api/v1/admin/slow-queries", headers=headers).status_code == 403
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", [test_user_data["email"]])
+
+    response = client.get("/api/v1/admin/slow-queries", params={"limit": 50, "order_by": "p95"}, headers=headers)
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["order_by"] == "p95"
+    p95s = [query["p95_ms"] for query in report["queries"]]
+    assert p95s == sorted(p95s, reverse=True)
+    records = next(q for q in report["queries"] if "FROM health_records" in q["fingerprint"])
+    assert records["last_route"] == "/api/v1/health/records"
+    assert records["slow_count"] >= 1
+    assert any("ix_health_records_user_type_measured" in line for line in records["plan"])